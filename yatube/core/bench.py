@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.test.utils import override_settings
+
+BENCH_CACHE = 'bench'
+
+
+def bench_cache():
+    """Подменяет кэш по умолчанию кэшем BENCH_CACHE на время замера.
+
+    Замеры очищают кэш, и так они не сбрасывают кэш работающего сайта.
+    """
+    return override_settings(CACHES={
+        **settings.CACHES, 'default': settings.CACHES[BENCH_CACHE],
+    })
@@ -0,0 +1,106 @@
+import re
+from pathlib import Path
+
+CLASS_ATTRIBUTE = re.compile(r'\b(?:class=|addclass:)\s*(["\'])(.*?)\1', re.S)
+TEMPLATE_TAG = re.compile(r'{%.*?%}|{{.*?}}|{#.*?#}', re.S)
+SELECTOR_CLASS = re.compile(r'\.(-?[_a-zA-Z][\w-]*)')
+NEGATION = re.compile(r':not\([^)]*\)')
+COMMENT = re.compile(r'/\*(?!!).*?\*/', re.S)
+LICENSE = re.compile(r'/\*!.*?\*/', re.S)
+# Блоки, правила внутри которых отбираются так же, как снаружи
+GROUPING = ('@media', '@supports')
+
+
+def template_classes(paths) -> set:
+    """Классы из атрибутов class и фильтра addclass шаблонов paths.
+
+    Теги шаблонов выбрасываются, текст между ними остаётся: из
+    class="nav-link {% if a %}active{% endif %}" получится
+    nav-link и active.
+    """
+    classes = set()
+    for path in paths:
+        text = Path(path).read_text(encoding='utf-8')
+        for _, value in CLASS_ATTRIBUTE.findall(text):
+            classes.update(TEMPLATE_TAG.sub(' ', value).split())
+    return classes
+
+
+def parse(css) -> list:
+    """Правила верхнего уровня: пары (прелюдия, тело).
+
+    У @-инструкций без блока, вроде @charset, тело — None.
+    """
+    rules = []
+    position = 0
+    while True:
+        brace = css.find('{', position)
+        if brace == -1:
+            return rules
+        semicolon = css.find(';', position, brace)
+        if semicolon != -1:
+            rules.append((css[position:semicolon + 1].strip(), None))
+            position = semicolon + 1
+            continue
+        depth, end = 1, brace + 1
+        while depth:
+            end = min(
+                index for index in (css.find('{', end), css.find('}', end))
+                if index != -1
+            ) + 1
+            depth += 1 if css[end - 1] == '{' else -1
+        rules.append((css[position:brace].strip(), css[brace + 1:end - 1]))
+        position = end
+
+
+def split_selectors(prelude) -> list:
+    """Селекторы списка через запятую, не разрывая скобки :not(...)."""
+    selectors, depth, start = [], 0, 0
+    for index, char in enumerate(prelude):
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and not depth:
+            selectors.append(prelude[start:index])
+            start = index + 1
+    selectors.append(prelude[start:])
+    return selectors
+
+
+def uses_only(selector, classes) -> bool:
+    """Все ли классы селектора, кроме отрицаемых, есть в classes."""
+    return set(SELECTOR_CLASS.findall(NEGATION.sub('', selector))) <= classes
+
+
+def purge(css, classes, keep_at_rules=True) -> str:
+    """CSS без селекторов, которым нужны классы не из classes.
+
+    Правило остаётся, если у него остался хоть один селектор; пустые
+    @media и @supports выбрасываются. keep_at_rules=False выбрасывает
+    и остальные @-правила: @charset, @keyframes, @font-face.
+    """
+    kept = []
+    for prelude, body in parse(COMMENT.sub('', LICENSE.sub('', css))):
+        if prelude.startswith(GROUPING):
+            inner = purge(body, classes, keep_at_rules)
+            if inner:
+                kept.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@'):
+            if keep_at_rules and body is None:
+                kept.append(prelude)
+            elif keep_at_rules:
+                kept.append(f'{prelude}{{{body}}}')
+        else:
+            selectors = [
+                selector for selector in split_selectors(prelude)
+                if uses_only(selector, classes)
+            ]
+            if selectors:
+                kept.append(f'{",".join(selectors)}{{{body}}}')
+    return ''.join(kept)
+
+
+def license_comments(css) -> str:
+    """Комментарии /*! ... */, которые нельзя выбрасывать из сборки."""
+    return '\n'.join(LICENSE.findall(css))
@@ -0,0 +1,86 @@
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+LOCK_KEY = 'lock:{}'
+POLL_INTERVAL = 0.05
+EVENTS = ('hit', 'miss', 'stale', 'lock_wait')
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(event) -> None:
+    with _stats_lock:
+        _stats[event] += 1
+
+
+def stats() -> dict:
+    """Счётчики попаданий, промахов, устаревших ответов и ожиданий."""
+    with _stats_lock:
+        return {event: _stats[event] for event in EVENTS}
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+def get_or_set(key, compute, timeout, fallback_key=None, cacheable=None):
+    """cache.get_or_set, который не даёт запросам пересчитывать ключ хором.
+
+    Значение хранится вместе со сроком свежести и живёт в кэше ещё
+    CACHE_GRACE секунд после него. Пересчитывает значение только тот
+    запрос, что взял блокировку; остальные получают устаревшее значение,
+    а если его нет — ждут пересчёта не дольше CACHE_LOCK_TIMEOUT.
+    fallback_key — ключ, под которым дополнительно хранится последнее
+    значение: им можно ответить, когда основной ключ сменился, например
+    с поколением. cacheable решает, сохранять ли посчитанное значение;
+    если не сохранять, ждущие запросы перестают ждать, как только
+    блокировка снята, и считают значение сами.
+    """
+    keys = [key] + ([fallback_key] if fallback_key else [])
+    found = cache.get_many(keys)
+    entry = found.get(key)
+    if entry is not None and entry[1] > time.time():
+        _count('hit')
+        return entry[0]
+    stale = entry or found.get(fallback_key)
+    lock = LOCK_KEY.format(key)
+    token = uuid.uuid4().hex
+    if cache.add(lock, token, settings.CACHE_LOCK_TIMEOUT):
+        try:
+            _count('miss')
+            value = compute()
+            if cacheable is None or cacheable(value):
+                cache.set_many(
+                    {name: (value, time.time() + timeout) for name in keys},
+                    timeout + settings.CACHE_GRACE
+                )
+            return value
+        finally:
+            # блокировка могла истечь и достаться другому запросу;
+            # сравнить и удалить атомарно API кэша не умеет, но так
+            # чужая блокировка снимается только в узком окне между ними
+            if cache.get(lock) == token:
+                cache.delete(lock)
+    if stale is not None:
+        _count('stale')
+        return stale[0]
+    _count('lock_wait')
+    deadline = time.time() + settings.CACHE_LOCK_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(POLL_INTERVAL)
+        found = cache.get_many([key, lock])
+        if key in found:
+            return found[key][0]
+        if lock not in found:
+            # пересчёт закончился, а значение не сохранено: например,
+            # ответ не прошёл cacheable — ждать больше нечего
+            break
+    _count('miss')
+    return compute()
@@ -0,0 +1,286 @@
+import json
+import statistics
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from core.bench import bench_cache
+from core.guarded_cache import reset_stats, stats
+from posts.models import AuthorStats, Comment, Follow, Group, Post, User
+
+URLCONFS = ('posts.urls', 'posts.api_urls', 'users.urls', 'about.urls')
+ROLES = ('guest', 'user')
+# POST-запросы, которые замеряются в дополнение к GET
+WRITES = {
+    'posts:post_create': {'text': 'Замер'},
+    'posts:add_comment': {'text': 'Замер'},
+}
+# адрес вне INTERNAL_IPS, чтобы не включалась debug toolbar
+REMOTE_ADDR = '203.0.113.1'
+PERCENTILES = (50, 95, 99)
+
+
+def routes():
+    """Имена и параметры всех маршрутов приложений из URLCONFS."""
+    for module in URLCONFS:
+        urls = import_module(module)
+        for pattern in urls.urlpatterns:
+            yield (
+                f'{urls.app_name}:{pattern.name}',
+                tuple(pattern.pattern.converters),
+            )
+
+
+class QueryTimer:
+    """Обёртка execute, считающая запросы и их время без debug-курсора."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+def percentile(values, percent) -> float:
+    """Перцентиль с линейной интерполяцией между соседними замерами.
+
+    Совпадает со statistics.quantiles(method='inclusive'), которого нет
+    в Python 3.7.
+    """
+    values = sorted(values)
+    position = (len(values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (
+        position - lower
+    )
+
+
+def summarize(latencies, queries, sql_times, sizes, status) -> dict:
+    summary = {
+        f'p{percent}_ms': round(percentile(latencies, percent) * 1000, 3)
+        for percent in PERCENTILES
+    }
+    summary.update(
+        mean_ms=round(statistics.mean(latencies) * 1000, 3),
+        queries=max(queries),
+        sql_ms=round(statistics.median(sql_times) * 1000, 3),
+        bytes=max(sizes),
+        status=status,
+    )
+    return summary
+
+
+def regressions(baseline, results, threshold, noise_ms) -> list:
+    """Замеры, которые хуже базовых больше чем на threshold.
+
+    Время сравнивается по p95 и только если разница больше noise_ms,
+    число запросов — строго.
+    """
+    found = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        slower = result['p95_ms'] - before['p95_ms']
+        if (
+            slower > noise_ms
+            and result['p95_ms'] > before['p95_ms'] * (1 + threshold)
+        ):
+            found.append(
+                f'{key}: p95 {before["p95_ms"]} -> {result["p95_ms"]} мс'
+            )
+        if result['queries'] > before['queries']:
+            found.append(
+                f'{key}: запросов {before["queries"]} -> {result["queries"]}'
+            )
+    return found
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет все страницы posts, users, about и JSON API через '
+        'тестовый клиент для гостя и пользователя и печатает p50/p95/p99, '
+        'число и время SQL-запросов и размер ответа. Рассчитана на базу, '
+        'заполненную seed_yatube; изменения откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--only', default='',
+            help='Замерять только маршруты, содержащие эту подстроку.'
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.'
+        )
+        parser.add_argument('--output', help='Куда записать JSON.')
+        parser.add_argument(
+            '--baseline', help='JSON прошлого запуска для сравнения.'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый рост p95, доля от базового значения.'
+        )
+        parser.add_argument(
+            '--noise', type=float, default=1.0,
+            help='Рост p95 меньше этого числа миллисекунд не считается.'
+        )
+
+    @bench_cache()
+    def handle(self, *args, **options):
+        if options['repeat'] < 2:
+            raise CommandError('--repeat должен быть не меньше 2.')
+        self.options = options
+        with transaction.atomic():
+            self.fixtures = self.pick_fixtures()
+            results = self.run()
+            transaction.set_rollback(True)
+        cache.clear()
+        report = {'meta': self.meta(), 'results': results}
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)['results']
+            found = regressions(
+                baseline, results, options['threshold'], options['noise']
+            )
+            if found:
+                raise CommandError(
+                    'Регрессии производительности:\n' + '\n'.join(found)
+                )
+
+    def pick_fixtures(self) -> dict:
+        """Самые тяжёлые объекты базы: на них страницы медленнее всего."""
+        stats = AuthorStats.objects.select_related('user')
+        reader = stats.order_by('-following_count').first()
+        author = stats.order_by('-posts_count').first()
+        group = Group.objects.annotate(
+            posts_count=Count('posts')
+        ).order_by('-posts_count').first()
+        post = Post.objects.annotate(
+            comments_count=Count('comments')
+        ).order_by('-comments_count').first()
+        if None in (reader, author, group, post):
+            raise CommandError(
+                'В базе нет данных для замера: запустите seed_yatube.'
+            )
+        return {
+            'user': reader.user,
+            'username': author.user.username,
+            'slug': group.slug,
+            'post_id': post.pk,
+            'uidb64': urlsafe_base64_encode(force_bytes(reader.user.pk)),
+            'token': default_token_generator.make_token(reader.user),
+        }
+
+    def cases(self):
+        for name, params in routes():
+            if self.options['only'] not in name:
+                continue
+            url = reverse(
+                name, kwargs={param: self.fixtures[param] for param in params}
+            )
+            yield f'GET {name}', url, None
+            if name in WRITES:
+                yield f'POST {name}', url, WRITES[name]
+
+    def run(self) -> dict:
+        results = {}
+        self.stdout.write(
+            f'{"":<40} {"p50":>8} {"p95":>8} {"p99":>8} '
+            f'{"queries":>7} {"sql":>8} {"bytes":>9}'
+        )
+        for role in ROLES:
+            for label, url, data in self.cases():
+                key = f'{role} {label}'
+                results[key] = self.measure(role, url, data)
+                self.stdout.write(
+                    f'{key:<40} '
+                    + ' '.join(
+                        f'{results[key][f"p{percent}_ms"]:>8.2f}'
+                        for percent in PERCENTILES
+                    )
+                    + f' {results[key]["queries"]:>7}'
+                    f' {results[key]["sql_ms"]:>8.2f}'
+                    f' {results[key]["bytes"]:>9}'
+                )
+        return results
+
+    def measure(self, role, url, data) -> dict:
+        client = Client(REMOTE_ADDR=REMOTE_ADDR)
+        latencies, queries, sql_times, sizes = [], [], [], []
+        total = self.options['warmup'] + self.options['repeat']
+        for number in range(total):
+            # logout и смена пароля разлогинивают, поэтому сессия
+            # восстанавливается до начала замера
+            if role == 'user' and '_auth_user_id' not in client.session:
+                client.force_login(self.fixtures['user'])
+            if self.options['cold']:
+                cache.clear()
+            if number == self.options['warmup']:
+                reset_stats()
+            timer = QueryTimer()
+            with connection.execute_wrapper(timer):
+                started = time.perf_counter()
+                if data is None:
+                    response = client.get(url)
+                else:
+                    response = client.post(url, data)
+                body = (
+                    b''.join(response.streaming_content)
+                    if response.streaming else response.content
+                )
+                elapsed = time.perf_counter() - started
+            if number < self.options['warmup']:
+                continue
+            latencies.append(elapsed)
+            queries.append(timer.count)
+            sql_times.append(timer.seconds)
+            sizes.append(len(body))
+        summary = summarize(
+            latencies, queries, sql_times, sizes, response.status_code
+        )
+        summary['cache'] = stats()
+        return summary
+
+    def meta(self) -> dict:
+        return {
+            'created': timezone.now().isoformat(),
+            'repeat': self.options['repeat'],
+            'cold': self.options['cold'],
+            'database': connection.vendor,
+            'settings': {
+                name: getattr(settings, name)
+                for name in (
+                    'POSTS_PAGINATION',
+                    'FOLLOW_FEED_ENGINE',
+                    'POSTS_PER_PAGE',
+                )
+            },
+            'rows': {
+                model.__name__: model.objects.count()
+                for model in (User, Group, Post, Comment, Follow)
+            },
+        }
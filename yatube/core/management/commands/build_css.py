@@ -0,0 +1,68 @@
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import css
+
+STATIC_DIR = os.path.join(settings.BASE_DIR, 'static')
+SOURCE = 'css/bootstrap.min.css'
+PURGED = 'css/site.css'
+CRITICAL = 'includes/critical_css.html'
+# Шаблоны того, что видно до прокрутки на любой странице
+ABOVE_THE_FOLD = ('base.html', 'includes/header.html')
+
+
+def outputs() -> dict:
+    """Содержимое собираемых файлов по их путям."""
+    source = Path(STATIC_DIR, SOURCE).read_text(encoding='utf-8')
+    templates = Path(settings.TEMPLATES_DIR)
+    purged = css.purge(source, css.template_classes(
+        path for path in templates.rglob('*.html')
+        if path != templates / CRITICAL
+    ))
+    critical = css.purge(
+        source,
+        css.template_classes(templates / name for name in ABOVE_THE_FOLD),
+        keep_at_rules=False,
+    )
+    charset = ''
+    if purged.startswith('@charset'):
+        # @charset обязан быть первым, даже раньше комментария с лицензией
+        charset, purged = purged.split(';', 1)
+        charset += ';\n'
+    return {
+        Path(STATIC_DIR, PURGED):
+            f'{charset}{css.license_comments(source)}\n{purged}\n',
+        templates / CRITICAL:
+            f'{{% verbatim %}}{critical}{{% endverbatim %}}\n',
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        f'Собирает из {SOURCE} стили только с классами из шаблонов '
+        f'и критический CSS для base.html.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Не записывать файлы, а проверить, что они не устарели.'
+        )
+
+    def handle(self, *args, **options):
+        stale = []
+        for path, content in outputs().items():
+            if path.exists() and path.read_text(encoding='utf-8') == content:
+                continue
+            stale.append(path)
+            if not options['check']:
+                path.write_text(content, encoding='utf-8')
+                self.stdout.write(f'{path}: {len(content)} байт')
+        if options['check'] and stale:
+            raise CommandError(
+                'Устарели: ' + ', '.join(map(str, stale))
+                + '. Запустите manage.py build_css.'
+            )
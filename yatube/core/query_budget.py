@@ -0,0 +1,39 @@
+from contextlib import ContextDecorator
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class query_budget(ContextDecorator):
+    """Падает, если внутри блока выполнено больше limit SQL-запросов.
+
+    Работает и как контекстный менеджер, и как декоратор теста:
+
+        with query_budget(5):
+            client.get('/')
+
+        @query_budget(5)
+        def test_index(self): ...
+    """
+
+    def __init__(self, limit, using=DEFAULT_DB_ALIAS):
+        self.limit = limit
+        self.using = using
+
+    def __enter__(self):
+        self.context = CaptureQueriesContext(connections[self.using])
+        self.context.__enter__()
+        return self.context
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None or len(self.context) <= self.limit:
+            return False
+        queries = '\n'.join(
+            f'{number}. {query["sql"]}'
+            for number, query in enumerate(self.context.captured_queries, 1)
+        )
+        raise AssertionError(
+            f'{len(self.context)} запросов при бюджете {self.limit}:\n'
+            f'{queries}'
+        )
@@ -0,0 +1,137 @@
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage, staticfiles_storage
+)
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import cached_property
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.txt', '.xml', '.json', '.map', '.ico')
+# Сжатая копия хранится, только если она заметно меньше оригинала
+MIN_SAVING = 0.95
+# Кодировки в порядке предпочтения и расширения их копий
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=0, must-revalidate'
+Q_VALUE = re.compile(r'q=([01](?:\.\d*)?)')
+
+
+def compressors() -> dict:
+    """Сжимающие функции по расширению копии; brotli — если установлен."""
+    found = {'.gz': lambda data: gzip.compress(data, 9, mtime=0)}
+    if brotli is not None:
+        found['.br'] = brotli.compress
+    return found
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хешем содержимого в именах и сжатыми копиями рядом.
+
+    collectstatic кладёт рядом с каждым хешированным текстовым файлом
+    .gz и, если установлен brotli, .br. Манифест читается один раз при
+    создании хранилища, и {% static %} дальше ищет имена в памяти.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            if name.endswith(COMPRESSIBLE):
+                yield from self.compress(name)
+
+    def compress(self, name):
+        """Сжатые копии name; старые копии перезаписываются.
+
+        save() при совпадении имён молча выбирает другое, а копия должна
+        лечь точно рядом с оригиналом, поэтому другое имя — ошибка,
+        которую collectstatic покажет.
+        """
+        with self.open(name) as file:
+            data = file.read()
+        for extension, compress in compressors().items():
+            compressed = compress(data)
+            if len(compressed) >= len(data) * MIN_SAVING:
+                continue
+            target = name + extension
+            if self.exists(target):
+                self.delete(target)
+            saved = self.save(target, ContentFile(compressed))
+            if saved != target:
+                self.delete(saved)
+                yield name, target, FileExistsError(
+                    f'Сжатая копия {target} сохранилась как {saved}.'
+                )
+                continue
+            yield name, target, True
+
+    @cached_property
+    def immutable_names(self) -> frozenset:
+        """Имена с хешем: их содержимое никогда не меняется."""
+        return frozenset(self.hashed_files.values())
+
+
+def accepted_encodings(header) -> set:
+    """Кодировки из Accept-Encoding, которые клиент не запретил q=0."""
+    accepted = set()
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        quality = Q_VALUE.search(params)
+        if coding.strip() and (quality is None or float(quality[1]) > 0):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def serve(request, path):
+    """Отдаёт собранную статику из STATIC_ROOT.
+
+    Файлы с хешем в имени браузер кэширует навсегда, остальные
+    перепроверяет. Сжатая копия выбирается по Accept-Encoding.
+    """
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+    stat = os.stat(fullpath)
+    if not was_modified_since(
+        request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime,
+        stat.st_size,
+    ):
+        return HttpResponseNotModified()
+    content_type, _ = mimetypes.guess_type(fullpath)
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    encoding = None
+    for coding, extension in ENCODINGS:
+        if coding in accepted and os.path.isfile(fullpath + extension):
+            encoding = coding
+            fullpath += extension
+            break
+    response = FileResponse(
+        open(fullpath, 'rb'),
+        content_type=content_type or 'application/octet-stream',
+    )
+    if encoding:
+        response['Content-Encoding'] = encoding
+    if path.endswith(COMPRESSIBLE):
+        patch_vary_headers(response, ('Accept-Encoding',))
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    immutable = getattr(staticfiles_storage, 'immutable_names', ())
+    response['Cache-Control'] = IMMUTABLE if path in immutable else REVALIDATE
+    return response
@@ -1,8 +1,28 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
 from http import HTTPStatus
+from io import StringIO
+from unittest import mock
 
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.conf import settings
+from django.templatetags.static import static
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 
+from posts.models import Group, Post
+from . import css, static as static_files
+from .bench import bench_cache
+from .guarded_cache import LOCK_KEY, get_or_set, reset_stats, stats
+from .management.commands.bench_views import percentile, regressions
+
 
 User = get_user_model()
 
@@ -33,3 +53,326 @@ class TestUrlCore(TestCase):
             self.authorized_client.get('/unexisting_page/'),
             'core/404.html'
         )
+
+
+class BenchViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Бенчмарк')
+        cls.group = Group.objects.create(
+            title='Замеры',
+            slug='bench',
+            description='Группа для замеров',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='Замеряемый пост',
+        )
+
+    def bench(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'bench.json')
+            call_command(
+                'bench_views', *args, repeat=2, warmup=0,
+                output=output, stdout=StringIO(), **options
+            )
+            with open(output, encoding='utf-8') as file:
+                return json.load(file)
+
+    def test_report_covers_every_route(self):
+        """Отчёт содержит все маршруты для гостя и пользователя."""
+        results = self.bench()['results']
+        for key in (
+            'guest GET posts:index',
+            'user GET posts:follow_index',
+            'user POST posts:add_comment',
+            'guest GET users:reset_link_email',
+            'user GET about:tech',
+        ):
+            with self.subTest(key=key):
+                self.assertIn(key, results)
+        self.assertEqual(
+            results['user GET posts:post_detail']['status'], HTTPStatus.OK
+        )
+        self.assertGreater(results['guest GET posts:index']['bytes'], 0)
+        self.assertFalse(Post.objects.filter(text='Замер').exists())
+
+    def test_cold_run_keeps_site_cache(self):
+        """Замер с --cold не очищает кэш сайта."""
+        cache.set('site', 'ready')
+        self.bench(only='about', cold=True)
+        self.assertEqual(cache.get('site'), 'ready')
+
+    def test_baseline_regression_fails(self):
+        """Рост числа запросов относительно базового отчёта — ошибка."""
+        report = self.bench(only='about')
+        for result in report['results'].values():
+            result['queries'] = -1
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as baseline:
+            json.dump(report, baseline)
+            baseline.flush()
+            with self.assertRaisesMessage(CommandError, 'about:author'):
+                self.bench(only='about', baseline=baseline.name)
+
+    def test_regressions_ignore_noise(self):
+        """Медленнее на доли миллисекунды — не регрессия."""
+        baseline = {'page': {'p95_ms': 1.0, 'queries': 3}}
+        self.assertEqual(
+            regressions(
+                baseline, {'page': {'p95_ms': 1.5, 'queries': 3}}, 0.2, 1.0
+            ),
+            []
+        )
+        self.assertEqual(
+            len(regressions(
+                baseline, {'page': {'p95_ms': 5.0, 'queries': 4}}, 0.2, 1.0
+            )),
+            2
+        )
+
+    def test_percentile_interpolates(self):
+        """Перцентили считаются без statistics.quantiles из Python 3.8."""
+        values = [4.0, 1.0, 3.0, 2.0]
+        self.assertEqual(percentile(values, 50), 2.5)
+        self.assertAlmostEqual(percentile(values, 95), 3.85)
+        self.assertEqual(percentile([1.0, 2.0], 99), 1.99)
+
+    def test_bench_cache_keeps_site_cache(self):
+        """Очистка кэша во время замера не трогает кэш сайта."""
+        cache.set('site', 'ready')
+        with bench_cache():
+            cache.set('bench', 'ready')
+            cache.clear()
+            self.assertIsNone(cache.get('site'))
+        self.assertEqual(cache.get('site'), 'ready')
+        self.assertIsNone(cache.get('bench'))
+
+
+@override_settings(CACHE_GRACE=30, CACHE_LOCK_TIMEOUT=2)
+class GuardedCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_stats()
+        self.calls = 0
+
+    def compute(self, value='свежее', delay=0):
+        def compute():
+            self.calls += 1
+            time.sleep(delay)
+            return value
+        return compute
+
+    def test_hit_and_miss(self):
+        """Второе обращение берёт значение из кэша."""
+        for _ in range(2):
+            self.assertEqual(get_or_set('key', self.compute(), 60), 'свежее')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(
+            stats(), {'hit': 1, 'miss': 1, 'stale': 0, 'lock_wait': 0}
+        )
+
+    def test_stale_served_while_locked(self):
+        """Пока значение пересчитывается, отдаётся устаревшее."""
+        get_or_set('key', self.compute('старое'), -1)
+        cache.add(LOCK_KEY.format('key'), True)
+        self.assertEqual(get_or_set('key', self.compute(), 60), 'старое')
+        get_or_set('other', self.compute('прошлое поколение'), 60, 'page')
+        cache.add(LOCK_KEY.format('next'), True)
+        self.assertEqual(
+            get_or_set('next', self.compute(), 60, 'page'),
+            'прошлое поколение'
+        )
+        self.assertEqual(stats()['stale'], 2)
+
+    def test_expired_value_recomputed_once(self):
+        """Истёкшее значение пересчитывает только первый запрос."""
+        get_or_set('key', self.compute('старое'), -1)
+        self.assertEqual(get_or_set('key', self.compute(), 60), 'свежее')
+        self.assertEqual(get_or_set('key', self.compute(), 60), 'свежее')
+        self.assertEqual(self.calls, 2)
+
+    def test_concurrent_requests_compute_once(self):
+        """Одновременные промахи ждут одного пересчёта."""
+        results = []
+
+        def request():
+            results.append(
+                get_or_set('key', self.compute(delay=0.2), 60)
+            )
+        threads = [threading.Thread(target=request) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['свежее'] * 5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(stats()['lock_wait'], 4)
+
+    def test_uncacheable_releases_waiters(self):
+        """Несохранённое значение не держит ждущих до конца таймаута."""
+        results = []
+
+        def request():
+            results.append(get_or_set(
+                'key', self.compute(delay=0.2), 60,
+                cacheable=lambda value: False,
+            ))
+        started = time.monotonic()
+        threads = [threading.Thread(target=request) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLess(time.monotonic() - started, 1.5)
+        self.assertEqual(results, ['свежее'] * 3)
+        self.assertEqual(self.calls, 3)
+        self.assertIsNone(cache.get(LOCK_KEY.format('key')))
+
+    def test_foreign_lock_kept(self):
+        """Истёкшая блокировка, взятая другим запросом, не снимается."""
+        lock = LOCK_KEY.format('key')
+
+        def compute():
+            cache.set(lock, 'чужая')
+            return 'свежее'
+        get_or_set('key', compute, 60)
+        self.assertEqual(cache.get(lock), 'чужая')
+
+
+STATIC_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(
+    STATIC_ROOT=STATIC_ROOT,
+    STATICFILES_STORAGE='core.static.CompressedManifestStaticFilesStorage',
+)
+class StaticFilesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('collectstatic', interactive=False, verbosity=0)
+        path = os.path.join(settings.BASE_DIR, 'static', 'css')
+        with open(os.path.join(path, 'bootstrap.min.css'), 'rb') as file:
+            cls.css = file.read()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(STATIC_ROOT, ignore_errors=True)
+
+    def test_hashed_and_compressed(self):
+        """{% static %} даёт имя с хешем, рядом лежат сжатые копии."""
+        url = static('css/bootstrap.min.css')
+        self.assertRegex(
+            url, r'^/static/css/bootstrap\.min\.[0-9a-f]{12}\.css$'
+        )
+        path = os.path.join(STATIC_ROOT, url[len('/static/'):])
+        with open(path + '.gz', 'rb') as file:
+            self.assertEqual(gzip.decompress(file.read()), self.css)
+        self.assertEqual(
+            os.path.exists(path + '.br'), static_files.brotli is not None
+        )
+        self.assertFalse(os.path.exists(
+            os.path.join(STATIC_ROOT, static('img/logo.png')[8:]) + '.gz'
+        ))
+
+    def test_compress_overwrites_copies(self):
+        """Повторное сжатие заменяет копии, а не кладёт рядом новые."""
+        storage = static_files.CompressedManifestStaticFilesStorage()
+        name = static('css/bootstrap.min.css')[len('/static/'):]
+        list(storage.compress(name))
+        directory = os.path.dirname(os.path.join(STATIC_ROOT, name))
+        base = os.path.basename(name)
+        copies = [
+            entry for entry in os.listdir(directory)
+            if entry.startswith(base) and entry.endswith('.gz')
+        ]
+        self.assertEqual(copies, [base + '.gz'])
+        with mock.patch.object(
+            storage, 'get_available_name', return_value=name + '.other'
+        ):
+            results = list(storage.compress(name))
+        self.assertIsInstance(results[0][2], FileExistsError)
+        self.assertFalse(os.path.exists(
+            os.path.join(STATIC_ROOT, name + '.other')
+        ))
+        list(storage.compress(name))
+
+    def test_served_by_accept_encoding(self):
+        """Ответ сжат, если клиент это умеет, и кэшируется навсегда."""
+        url = static('css/bootstrap.min.css')
+        client = Client()
+        response = client.get(url, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Cache-Control'], static_files.IMMUTABLE)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)), self.css
+        )
+        response = client.get(url)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), self.css)
+
+    def test_unhashed_revalidated(self):
+        """Файл без хеша в имени браузер перепроверяет."""
+        response = Client().get('/static/css/bootstrap.min.css')
+        self.assertEqual(response['Cache-Control'], static_files.REVALIDATE)
+        self.assertEqual(Client().get('/static/css/none.css').status_code, 404)
+
+    def test_accepted_encodings(self):
+        self.assertEqual(
+            static_files.accepted_encodings('gzip;q=0.5, BR , deflate;q=0'),
+            {'gzip', 'br'},
+        )
+
+
+class CssBuildTest(TestCase):
+    def test_purge(self):
+        """Остаются селекторы только с классами из шаблонов."""
+        source = (
+            '@charset "UTF-8";/*! лицензия */.a{color:red}/* заметка */'
+            '.b,.a:hover,p{margin:0}.x:not(.b){top:0}'
+            '@media (min-width:1px){.c{left:0}.a .x{right:0}}'
+            '@keyframes k{0%{opacity:0}}'
+        )
+        self.assertEqual(
+            css.purge(source, {'a', 'x'}),
+            '@charset "UTF-8";.a{color:red}.a:hover,p{margin:0}'
+            '.x:not(.b){top:0}@media (min-width:1px){.a .x{right:0}}'
+            '@keyframes k{0%{opacity:0}}',
+        )
+        self.assertEqual(
+            css.purge(source, {'c'}, keep_at_rules=False),
+            'p{margin:0}@media (min-width:1px){.c{left:0}}',
+        )
+        self.assertEqual(css.license_comments(source), '/*! лицензия */')
+
+    def test_template_classes(self):
+        """Классы собираются из class и addclass, без тегов шаблона."""
+        with tempfile.NamedTemporaryFile('w', suffix='.html') as template:
+            template.write(
+                '<a class="nav-link {% if a %}active{% endif %}">'
+                "{% include 'x.html' with class='card-img' %}"
+                "{{ field|addclass:'form-control' }}<b class=\"{{ c }}\">"
+            )
+            template.flush()
+            self.assertEqual(
+                css.template_classes([template.name]),
+                {'nav-link', 'active', 'card-img', 'form-control'},
+            )
+
+    def test_outputs_fresh(self):
+        """Собранные стили соответствуют шаблонам."""
+        call_command('build_css', '--check')
+
+    def test_critical_css_inlined(self):
+        """Стили первого экрана встроены, остальные не блокируют."""
+        response = Client().get('/')
+        self.assertContains(response, '<style>:root{')
+        self.assertContains(
+            response, 'rel="preload" href="/static/css/site.css"'
+        )
+        self.assertNotContains(response, 'bootstrap.min.css')
@@ -1,6 +1,78 @@
+from django import forms
 from django.contrib import admin
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
 
-from .models import Post, Group
+from . import feeds
+from .caching import FOLLOW, POST, PROFILE, bump
+from .models import (
+    AuthorStats, Comment, CommentRow, Follow, FollowRow, Group, Post,
+    PostQuerySet, User,
+)
+from .pagination import EstimatedCountPaginator
+from .search import find_posts
+
+HIDDEN_TEXT = 'Комментарий скрыт модератором'
+
+
+def bulk_delete(queryset, rows) -> int:
+    """Удаляет выборку одним DELETE через прокси-модель rows без сигналов.
+
+    У комментариев и подписок нет зависимых строк, а то, что сделали бы
+    сигналы удаления, вызывающий код делает сам запросами на всю выборку.
+    """
+    deleted, _ = rows.objects.filter(pk__in=queryset.values('pk')).delete()
+    return deleted
+
+
+def commented_posts(comments) -> list:
+    """Области страниц постов, на которых выведены комментарии."""
+    return [
+        POST.format(post_id=post_id)
+        for post_id in comments.values_list('post_id', flat=True).distinct()
+    ]
+
+
+class DateHierarchyQuerySet(PostQuerySet):
+    """Выборка списка постов, чья навигация по датам не сканирует таблицу.
+
+    Шаблонный тег date_hierarchy зовёт dates() у выборки списка; только
+    здесь она подменяется на PostQuerySet.pub_dates().
+    """
+
+    def dates(self, field_name, kind, order='ASC'):
+        if field_name == 'pub_date' and kind in ('year', 'month', 'day'):
+            return self.pub_dates(kind, order)
+        return super().dates(field_name, kind, order)
+
+
+class SharedOptionsSelect(forms.Select):
+    """Select, чьи варианты рендерятся один раз на все строки списка.
+
+    Копии виджета в формах строк делят словарь rendered, поэтому шаблон
+    варианта не рисуется заново для каждой строки и каждой группы.
+    """
+
+    def __init__(self, attrs=None, choices=()):
+        super().__init__(attrs, choices)
+        self.rendered = {}
+
+    def render(self, name, value, attrs=None, renderer=None):
+        if 'options' not in self.rendered:
+            self.rendered['options'] = format_html_join(
+                '', '<option value="{}">{}</option>', self.choices
+            )
+        selected = format_html(
+            '<option value="{}">', '' if value is None else value
+        )
+        options = mark_safe(self.rendered['options'].replace(
+            selected, selected[:-1] + ' selected>', 1
+        ))
+        return format_html(
+            '<select name="{}"{}>{}</select>',
+            name, flatatt(self.build_attrs(self.attrs, attrs)), options
+        )
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -16,7 +88,118 @@ class PostAdmin(admin.ModelAdmin):
     list_filter: tuple = ('pub_date', )
     list_editable: tuple = ('group', )
     empty_value_display: str = DEFAULT_EMPTY
+    list_select_related: tuple = ('author', 'group')
+    date_hierarchy: str = 'pub_date'
+    paginator = EstimatedCountPaginator
+    show_full_result_count: bool = False
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        """Группы для list_editable выбираются и рисуются раз на страницу.
+
+        Иначе каждая строка списка заново читает все группы из базы
+        и рендерит их шаблоном виджета.
+        """
+        if db_field.name == 'group':
+            kwargs['widget'] = SharedOptionsSelect
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == 'group':
+            field.choices = list(iter(field.choices))
+        return field
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return DateHierarchyQuerySet(
+            queryset.model, queryset.query.chain(), queryset.db
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по полнотекстовому индексу вместо LIKE '%q%'."""
+        if not search_term:
+            return queryset, False
+        return find_posts(search_term, queryset), False
+
+
+class BulkAdmin(admin.ModelAdmin):
+    """Админка больших таблиц: без точного COUNT(*) и с действием
+    delete_rows, которое удаляет выборку одним DELETE. Обычное удаление
+    со страницей подтверждения и сигналами остаётся доступным."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count: bool = False
+
+
+class CommentAdmin(BulkAdmin):
+    list_display: tuple = ('pk', 'text', 'post', 'author', 'created')
+    list_select_related: tuple = ('post', 'author')
+    autocomplete_fields: tuple = ('post', 'author')
+    search_fields: tuple = ('=author__username', 'text')
+    actions: list = ['delete_rows', 'hide_text']
+
+    def delete_rows(self, request, queryset):
+        """Одним DELETE и без страницы подтверждения со всеми объектами.
+
+        Вместо сигналов comment_deleted счётчики авторов пересчитываются,
+        а поколения их профилей и страниц постов сдвигаются.
+        """
+        authors = dict(
+            queryset.values_list('author_id', 'author__username').distinct()
+        )
+        posts = commented_posts(queryset)
+        deleted = bulk_delete(queryset, CommentRow)
+        AuthorStats.objects.recount(User.objects.filter(pk__in=authors))
+        bump(
+            *(PROFILE.format(username=name) for name in authors.values()),
+            *posts,
+        )
+        self.message_user(request, f'Удалено комментариев: {deleted}.')
+    delete_rows.allowed_permissions = ('delete', )
+    delete_rows.short_description = 'Удалить выбранные комментарии'
+
+    def hide_text(self, request, queryset):
+        posts = commented_posts(queryset)
+        hidden = queryset.update(text=HIDDEN_TEXT)
+        bump(*posts)
+        self.message_user(request, f'Скрыто комментариев: {hidden}.')
+    hide_text.allowed_permissions = ('change', )
+    hide_text.short_description = 'Скрыть текст выбранных комментариев'
+
+
+class FollowAdmin(BulkAdmin):
+    list_display: tuple = ('pk', 'user', 'author')
+    list_select_related: tuple = ('user', 'author')
+    autocomplete_fields: tuple = ('user', 'author')
+    search_fields: tuple = ('=user__username', '=author__username')
+    actions: list = ['delete_rows']
+
+    def delete_rows(self, request, queryset):
+        """Одним DELETE; ленты и счётчики чинятся запросами на всю выборку.
+
+        Вместо сигналов follow_deleted ленты читателей чистятся (полные
+        собираются заново, как при отписке), счётчики пересчитываются,
+        поколения лент и профилей сдвигаются.
+        """
+        rows = list(queryset.values_list(
+            'user_id', 'user__username', 'author_id', 'author__username'
+        ).distinct())
+        deleted = bulk_delete(queryset, FollowRow)
+        readers = {row[0] for row in rows}
+        feeds.prune(readers)
+        AuthorStats.objects.recount(
+            User.objects.filter(pk__in=readers | {row[2] for row in rows})
+        )
+        scopes = set()
+        for user_id, username, author_id, author in rows:
+            scopes.update((
+                FOLLOW.format(user_id=user_id),
+                PROFILE.format(username=username),
+                PROFILE.format(username=author),
+            ))
+        bump(*scopes)
+        self.message_user(request, f'Удалено подписок: {deleted}.')
+    delete_rows.allowed_permissions = ('delete', )
+    delete_rows.short_description = 'Удалить выбранные подписки'
 
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(Follow, FollowAdmin)
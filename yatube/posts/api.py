@@ -0,0 +1,239 @@
+from functools import wraps
+from http import HTTPStatus
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
+
+from .caching import (
+    FOLLOW, GROUP, INDEX, POST, PROFILE, cache_feed, conditional
+)
+from .models import Comment, FeedEntry, Group, Post, User, post_images
+from .pagination import KEYS, CursorPaginator
+
+# Поля ответа и пути к ним для values(): автор и группа приходят
+# тем же запросом через JOIN, без моделей.
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+COMMENT_KEYS = ('created', 'id')
+FORMATTERS = {
+    'image': lambda name: post_images.url(name) if name else None,
+}
+# Кириллица в ответах и ошибках идёт как есть, без \uXXXX
+JSON_DUMPS_PARAMS = {'ensure_ascii': False}
+
+
+class ApiError(Exception):
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def requested_fields(request, available) -> list:
+    """Поля из ?fields=id,text; без параметра — все."""
+    if 'fields' not in request.GET:
+        return list(available)
+    fields = [
+        field.strip()
+        for field in request.GET['fields'].split(',') if field.strip()
+    ]
+    if not fields:
+        raise ApiError(
+            HTTPStatus.BAD_REQUEST,
+            f'Не указано ни одного поля. Доступны: {", ".join(available)}.'
+        )
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise ApiError(
+            HTTPStatus.BAD_REQUEST,
+            f'Неизвестные поля: {", ".join(unknown)}. '
+            f'Доступны: {", ".join(available)}.'
+        )
+    return fields
+
+
+def serialize(rows, fields, columns) -> list:
+    """Словари ответа из строк values() с колонками columns."""
+    return [
+        {
+            field: FORMATTERS.get(field, lambda value: value)(
+                row[columns[field]]
+            )
+            for field in fields
+        }
+        for row in rows
+    ]
+
+
+def link(request, **params):
+    query = request.GET.copy()
+    for name in ('after', 'before'):
+        query.pop(name, None)
+    query.update(params)
+    return f'{request.path}?{query.urlencode()}'
+
+
+def page(request, queryset, available, keys=KEYS, prefix='') -> dict:
+    """Страница курсорной пагинации с полями из ?fields=.
+
+    prefix — путь от модели queryset к полям available: у ленты
+    подписок это 'post__'. Из базы читаются только нужные колонки
+    и ключи сортировки.
+    """
+    fields = requested_fields(request, available)
+    columns = {field: prefix + available[field] for field in fields}
+    rows = queryset.values(*{*columns.values(), *keys})
+    page_obj = CursorPaginator(
+        rows, settings.POSTS_PER_PAGE, keys
+    ).get_page(request.GET.get('after'), request.GET.get('before'))
+    data = {
+        'results': serialize(page_obj, fields, columns),
+        'next': None,
+        'previous': None,
+    }
+    if page_obj.has_next():
+        data['next'] = link(request, after=page_obj.next_cursor)
+    if page_obj.has_previous():
+        data['previous'] = link(request, before=page_obj.previous_cursor)
+    return data
+
+
+def error_response(error):
+    return JsonResponse(
+        {'detail': error.detail},
+        status=error.status,
+        json_dumps_params=JSON_DUMPS_PARAMS,
+    )
+
+
+def json_view(view):
+    """Отдаёт словарь из view как JSON, а ApiError — как ошибку с detail."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            data = view(request, *args, **kwargs)
+        except ApiError as error:
+            return error_response(error)
+        return JsonResponse(data, json_dumps_params=JSON_DUMPS_PARAMS)
+    return wrapper
+
+
+def not_found(detail):
+    return ApiError(HTTPStatus.NOT_FOUND, detail)
+
+
+@require_safe
+@conditional(INDEX)
+@cache_feed(INDEX)
+@json_view
+def index(request) -> dict:
+    return page(request, Post.objects, POST_FIELDS)
+
+
+@require_safe
+@conditional(GROUP)
+@cache_feed(GROUP)
+@json_view
+def group_posts(request, slug) -> dict:
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'id', flat=True
+    ).first()
+    if group_id is None:
+        raise not_found('Сообщество не найдено.')
+    return page(request, Post.objects.filter(group_id=group_id), POST_FIELDS)
+
+
+@require_safe
+@conditional(PROFILE)
+@cache_feed(PROFILE)
+@json_view
+def profile_posts(request, username) -> dict:
+    author_id = User.objects.filter(username=username).values_list(
+        'id', flat=True
+    ).first()
+    if author_id is None:
+        raise not_found('Пользователь не найден.')
+    return page(
+        request, Post.objects.filter(author_id=author_id), POST_FIELDS
+    )
+
+
+@require_safe
+@conditional(FOLLOW)
+@cache_feed(FOLLOW)
+@json_view
+def follow_posts(request) -> dict:
+    """Лента подписок; у движка 'merge' — запросом через Follow.
+
+    MergedFeed собирает посты-модели, а API читает values(), поэтому
+    без готовой ленты FeedEntry она строится тем же запросом, что и
+    у движка 'join'.
+    """
+    if not request.user.is_authenticated:
+        raise ApiError(HTTPStatus.UNAUTHORIZED, 'Нужно войти.')
+    if settings.FOLLOW_FEED_ENGINE == 'timeline':
+        return page(
+            request, FeedEntry.objects.filter(user=request.user),
+            POST_FIELDS, keys=('pub_date', 'post_id'), prefix='post__',
+        )
+    posts = Post.objects.filter(author__following__user=request.user)
+    return page(request, posts, POST_FIELDS)
+
+
+@require_safe
+def post_detail(request, post_id):
+    """Пост с именем автора и адресом группы.
+
+    Они выводятся в ответе, поэтому у ответа, как у HTML-страницы поста,
+    есть области профиля автора и группы; их находит один запрос.
+    """
+    owner = Post.objects.filter(id=post_id).values_list(
+        'author__username', 'group__slug'
+    ).first()
+    if owner is None:
+        return error_response(not_found('Пост не найден.'))
+    username, slug = owner
+    return post_response(
+        request, post_id=post_id, username=username, slug=slug or ''
+    )
+
+
+@conditional(POST, PROFILE, GROUP)
+@cache_feed(POST, PROFILE, GROUP)
+@json_view
+def post_response(request, post_id, username, slug) -> dict:
+    fields = requested_fields(request, POST_FIELDS)
+    row = Post.objects.filter(id=post_id).values(
+        *{POST_FIELDS[field] for field in fields}
+    ).first()
+    if row is None:
+        raise not_found('Пост не найден.')
+    return serialize([row], fields, POST_FIELDS)[0]
+
+
+@require_safe
+@conditional(POST)
+@cache_feed(POST)
+@json_view
+def comments(request, post_id) -> dict:
+    if not Post.objects.filter(id=post_id).exists():
+        raise not_found('Пост не найден.')
+    return page(
+        request,
+        Comment.objects.filter(post_id=post_id).order_by('-created', '-id'),
+        COMMENT_FIELDS, keys=COMMENT_KEYS,
+    )
@@ -0,0 +1,21 @@
+from django.urls import path
+
+from . import api
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', api.index, name='index'),
+    path('posts/<int:post_id>/', api.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/', api.comments, name='comments'
+    ),
+    path(
+        'groups/<slug:slug>/posts/', api.group_posts, name='group_posts'
+    ),
+    path(
+        'profiles/<str:username>/posts/', api.profile_posts,
+        name='profile_posts'
+    ),
+    path('follow/posts/', api.follow_posts, name='follow_posts'),
+]
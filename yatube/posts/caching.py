@@ -0,0 +1,237 @@
+import hashlib
+import time
+from functools import wraps
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from django.utils.safestring import mark_safe
+
+from core.guarded_cache import get_or_set
+from .pagination import page_state, restore_page
+from .thumbnails import is_ready, prefetch
+
+GENERATION_KEY = 'generation:{}'
+PAGE_KEY = 'page:{}:{}'
+FRAGMENT_KEY = 'fragment:page:{}'
+CARD_KEY = 'card:{}:{}'
+CARD_TEMPLATE = 'posts/includes/article.html'
+INDEX = 'index'
+GROUP = 'group:{slug}'
+PROFILE = 'profile:{username}'
+FOLLOW = 'follow:{user_id}'
+POST = 'post:{post_id}'
+
+
+def generations(scopes) -> list:
+    """Текущие поколения областей; отсутствующие заводятся заново."""
+    keys = [GENERATION_KEY.format(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            token = time.time_ns()
+            if not cache.add(key, token, None):
+                token = cache.get(key, token)
+            found[key] = token
+    return [found[key] for key in keys]
+
+
+def _set_generations(scopes) -> None:
+    token = time.time_ns()
+    cache.set_many(
+        {GENERATION_KEY.format(scope): token for scope in scopes}, None
+    )
+
+
+def bump(*scopes) -> None:
+    """Сдвигает поколения областей: их страницы перестают браться из кэша.
+
+    Новое поколение — не инкремент, а метка времени, поэтому вытесненный
+    из кэша счётчик не вернёт к жизни старые страницы. После коммита
+    поколения сдвигаются ещё раз, чтобы страница, собранная конкурентным
+    запросом до коммита, не пережила его.
+    """
+    if not scopes:
+        return
+    _set_generations(scopes)
+    transaction.on_commit(lambda: _set_generations(scopes))
+
+
+def post_scopes(post, followers=()) -> list:
+    """Области, на страницах которых виден пост."""
+    scopes = [
+        INDEX,
+        PROFILE.format(username=post.author.username),
+        POST.format(post_id=post.pk),
+    ]
+    if post.group_id:
+        scopes.append(GROUP.format(slug=post.group.slug))
+    scopes.extend(FOLLOW.format(user_id=user_id) for user_id in followers)
+    return scopes
+
+
+def digest(text) -> str:
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+def cacheable(response) -> bool:
+    return (
+        response.status_code == HTTPStatus.OK
+        and not response.streaming
+        and not response.cookies
+    )
+
+
+def shared_fragment(request, template, scopes, objects, paginate) -> tuple:
+    """Общая для всех пользователей часть страницы — «донат».
+
+    Фрагмент template со страницей paginate(objects) в page_obj кэшируется
+    по адресу страницы и поколениям scopes без учёта пользователя, а шапку
+    и прочие личные части view рисует на каждый запрос. Вместе с HTML
+    хранится page_state() страницы, и view при попадании и при промахе
+    одинаково получает восстановленную page_obj: её посты читаются,
+    только если к ним обратятся.
+    """
+    def render():
+        page_obj = paginate(objects)
+        html = render_to_string(template, {'page_obj': page_obj})
+        return html, page_state(page_obj)
+    tokens = '|'.join(str(token) for token in generations(scopes))
+    page = '|'.join([template, request.get_full_path()])
+    html, state = get_or_set(
+        FRAGMENT_KEY.format(digest(f'{page}|{tokens}')),
+        render,
+        settings.FEED_CACHE_TIMEOUT,
+        fallback_key=FRAGMENT_KEY.format(digest(page)),
+    )
+    return mark_safe(html), {'page_obj': restore_page(state, objects)}
+
+
+def card_version(post) -> str:
+    """Версия карточки — отпечаток всего, что карточка выводит.
+
+    Правка поста, имени автора или группы даёт новый ключ, и старую
+    карточку не нужно сбрасывать: она просто истечёт. Карточка с
+    оригиналом вместо миниатюры сменится, когда будут готовы миниатюра
+    и варианты для srcset.
+    """
+    return digest('|'.join((
+        CARD_TEMPLATE,
+        post.text,
+        post.image.name or '',
+        str(bool(post.image) and is_ready(post.image, 'card')),
+        str(len(getattr(post.image, 'variants', ()))),
+        post.pub_date.isoformat(),
+        post.author.get_full_name(),
+        post.group.slug if post.group_id else '',
+    )))
+
+
+def render_cards(posts) -> list:
+    """Карточки постов одним get_many; недостающие рисуются и кэшируются.
+
+    Посты должны приходить с автором и группой, как из for_feed().
+    Миниатюры всех карточек ищутся заранее одним обращением к kvstore.
+    """
+    posts = list(posts)
+    prefetch(posts)
+    keys = [CARD_KEY.format(post.pk, card_version(post)) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {
+        key: render_to_string(CARD_TEMPLATE, {'post': post})
+        for key, post in zip(keys, posts)
+        if key not in cards
+    }
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
+
+
+def scope_names(scopes, request, kwargs) -> list:
+    """Области из шаблонов: аргументы view и id пользователя."""
+    if any('{user_id}' in scope for scope in scopes):
+        kwargs = {'user_id': request.user.pk, **kwargs}
+    return [scope.format(**kwargs) for scope in scopes]
+
+
+def cache_feed(*scopes):
+    """Кэширует страницу ленты, пока не сменится поколение её областей.
+
+    Области — шаблоны строк, которые заполняются аргументами view и
+    id пользователя: 'group:{slug}', 'follow:{user_id}'. Страница
+    зависит от пользователя, поэтому в ключ входит кука сессии: так
+    попадание в кэш не требует загружать сессию из базы. Пока страницу
+    нового поколения пересчитывает один запрос, остальные получают
+    страницу прошлого поколения.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            names = scope_names(scopes, request, kwargs)
+            session = request.COOKIES.get(settings.SESSION_COOKIE_NAME, '')
+            page = '|'.join([request.get_full_path(), session])
+            tokens = '|'.join(str(token) for token in generations(names))
+            return get_or_set(
+                PAGE_KEY.format(view.__name__, digest(f'{page}|{tokens}')),
+                lambda: view(request, *args, **kwargs),
+                settings.FEED_CACHE_TIMEOUT,
+                fallback_key=PAGE_KEY.format(view.__name__, digest(page)),
+                cacheable=cacheable,
+            )
+        return wrapper
+    return decorator
+
+
+def validators(request, scopes) -> str:
+    """ETag страницы по поколениям её областей.
+
+    Как и в cache_feed, страница зависит от пользователя, поэтому в
+    ETag входят куки сессии и CSRF. Last-Modified не отдаётся: у него
+    секундная точность, и If-Modified-Since не учитывал бы ни сдвиг
+    поколения в ту же секунду, ни пользователя.
+    """
+    return quote_etag(digest('|'.join([
+        request.get_full_path(),
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME, ''),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        *(str(token) for token in generations(scopes)),
+    ])))
+
+
+def not_modified(request, etag):
+    """Ответ 304 на GET или HEAD с совпавшим ETag, иначе None."""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    response = get_conditional_response(request, etag=etag)
+    return response and with_validators(response, etag)
+
+
+def with_validators(response, etag):
+    if response.status_code in (HTTPStatus.OK, HTTPStatus.NOT_MODIFIED):
+        response['ETag'] = etag
+    return response
+
+
+def conditional(*scopes):
+    """Отвечает 304, не вызывая view, пока поколения областей те же.
+
+    Поколения лежат в кэше, поэтому на 304 не читаются ни страница,
+    ни её посты. Области — шаблоны строк, как у cache_feed.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            etag = validators(request, scope_names(scopes, request, kwargs))
+            response = not_modified(request, etag)
+            if response is not None:
+                return response
+            return with_validators(view(request, *args, **kwargs), etag)
+        return wrapper
+    return decorator
@@ -0,0 +1,112 @@
+import csv
+from datetime import datetime, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Post, start_of
+
+# Колонки выгрузки и пути к ним для values(): автор и группа
+# приходят тем же запросом через JOIN.
+COLUMNS = {
+    'posts': {
+        'id': 'id',
+        'pub_date': 'pub_date',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'image': 'image',
+    },
+    'comments': {
+        'id': 'id',
+        'created': 'created',
+        'post': 'post_id',
+        'author': 'author__username',
+        'group': 'post__group__slug',
+        'text': 'text',
+    },
+}
+FORMATS = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+CHUNK_SIZE = 2000
+# Строки склеиваются в куски примерно такого размера перед записью
+BUFFER_SIZE = 64 * 1024
+
+
+def rows(kind, since=None, until=None, group=None, author=None,
+         chunk_size=CHUNK_SIZE):
+    """Посты или комментарии словарями по возрастанию id.
+
+    since и until — даты включительно; group и author — объекты,
+    у комментариев group — группа поста. Строки читаются из курсора
+    кусками по chunk_size, без кэша queryset, поэтому память не растёт
+    с размером выгрузки.
+    """
+    columns = COLUMNS[kind]
+    if kind == 'posts':
+        objects, date_field, group_field = Post.objects, 'pub_date', 'group'
+    else:
+        objects, date_field, group_field = (
+            Comment.objects, 'created', 'post__group'
+        )
+    filters = {}
+    if since:
+        filters[f'{date_field}__gte'] = start_of(since)
+    if until:
+        filters[f'{date_field}__lt'] = start_of(until + timedelta(days=1))
+    if group:
+        filters[group_field] = group
+    if author:
+        filters['author'] = author
+    queryset = objects.filter(**filters).order_by('id').values_list(
+        *columns.values()
+    )
+    for values in queryset.iterator(chunk_size=chunk_size):
+        yield dict(zip(columns, values))
+
+
+def ndjson_lines(rows, columns):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+class Echo:
+    """Файл для csv.writer, который возвращает строку, а не пишет её."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, columns):
+    """CSV с заголовком; даты в том же виде, что и в NDJSON."""
+    encoder = DjangoJSONEncoder()
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(
+            encoder.default(value) if isinstance(value, datetime) else value
+            for value in row.values()
+        )
+
+
+WRITERS = {'ndjson': ndjson_lines, 'csv': csv_lines}
+
+
+def buffered(lines, size=BUFFER_SIZE):
+    """Склеивает строки в куски не меньше size символов."""
+    buffer, length = [], 0
+    for line in lines:
+        buffer.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream(kind, format, **filters):
+    """Выгрузка кусками текста в формате format ('ndjson' или 'csv')."""
+    return buffered(WRITERS[format](rows(kind, **filters), COLUMNS[kind]))
@@ -0,0 +1,261 @@
+import heapq
+from functools import lru_cache
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+
+from .models import FeedEntry, Follow, Post
+from .pagination import keyset
+
+RECENT_POSTS_KEY = 'feed:recent:{}'
+
+
+def trim(user_id) -> None:
+    overflow = FeedEntry.objects.filter(user_id=user_id).order_by(
+        '-pub_date', '-post_id'
+    ).values('id')[settings.FOLLOW_FEED_LENGTH:]
+    FeedEntry.objects.filter(id__in=overflow).delete()
+
+
+def trim_all() -> list:
+    """Обрезает все ленты длиннее FOLLOW_FEED_LENGTH.
+
+    fan_out ленты не обрезает, чтобы новый пост стоил один INSERT,
+    а не DELETE на каждого подписчика; лишние записи убирает эта
+    функция из периодической команды trim_feeds. Возвращает id
+    читателей, чьи ленты обрезаны.
+    """
+    overflowing = list(
+        FeedEntry.objects.order_by().values('user_id').annotate(
+            total=Count('id')
+        ).filter(total__gt=settings.FOLLOW_FEED_LENGTH).values_list(
+            'user_id', flat=True
+        )
+    )
+    for user_id in overflowing:
+        trim(user_id)
+    return overflowing
+
+
+def fan_out(post) -> list:
+    """Раскладывает новый пост по лентам подписчиков автора.
+
+    Ленты при этом могут вырасти сверх FOLLOW_FEED_LENGTH до ближайшего
+    trim_all. Возвращает id подписчиков, чьи ленты изменились.
+    """
+    followers = list(
+        Follow.objects.filter(author_id=post.author_id).values_list(
+            'user_id', flat=True
+        )
+    )
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers
+        ),
+        ignore_conflicts=True,
+    )
+    return followers
+
+
+def backfill(user_id, author_id) -> None:
+    """Добавляет в ленту свежие посты автора, на которого подписались."""
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'id', 'pub_date'
+    )[:settings.FOLLOW_FEED_LENGTH]
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts
+        ),
+        ignore_conflicts=True,
+    )
+    trim(user_id)
+
+
+def rebuild(user_ids) -> None:
+    """Заново собирает ленты читателей, например после bulk_create.
+
+    Ленты сливаются из списков последних постов авторов; популярные
+    авторы встречаются у многих читателей, поэтому списки кэшируются.
+    """
+    @lru_cache(maxsize=1000)
+    def latest(author_id):
+        return tuple(
+            Post.objects.filter(author_id=author_id).values_list(
+                'pub_date', 'id'
+            )[:settings.FOLLOW_FEED_LENGTH]
+        )
+
+    for user_id in user_ids:
+        authors = Follow.objects.filter(user_id=user_id).values_list(
+            'author_id', flat=True
+        )
+        merged = heapq.merge(
+            *(latest(author_id) for author_id in authors), reverse=True
+        )
+        with transaction.atomic():
+            FeedEntry.objects.filter(user_id=user_id).delete()
+            FeedEntry.objects.bulk_create(
+                FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+                for pub_date, post_id in islice(
+                    merged, settings.FOLLOW_FEED_LENGTH
+                )
+            )
+
+
+def clean_up(user_id, author_id) -> None:
+    """Убирает из ленты посты автора, от которого отписались.
+
+    Полная лента могла быть обрезана, и вместе с постами автора из неё
+    ушли бы и более старые посты остальных подписок, поэтому такая
+    лента собирается заново.
+    """
+    timeline = FeedEntry.objects.filter(user_id=user_id)
+    if timeline.count() >= settings.FOLLOW_FEED_LENGTH:
+        rebuild([user_id])
+        return
+    timeline.filter(post__author_id=author_id).delete()
+
+
+def prune(user_ids) -> None:
+    """Убирает из лент читателей посты авторов, на которых они не подписаны.
+
+    Одним DELETE, например после массового удаления подписок в админке.
+    Полные ленты, как в clean_up, собираются заново.
+    """
+    full = set(
+        FeedEntry.objects.order_by().filter(user_id__in=user_ids).values(
+            'user_id'
+        ).annotate(total=Count('id')).filter(
+            total__gte=settings.FOLLOW_FEED_LENGTH
+        ).values_list('user_id', flat=True)
+    )
+    followed = Follow.objects.filter(
+        user_id=OuterRef('user_id'), author_id=OuterRef('post__author_id')
+    )
+    FeedEntry.objects.filter(
+        user_id__in=set(user_ids) - full
+    ).annotate(
+        followed=Exists(followed)
+    ).filter(followed=False).delete()
+    rebuild(sorted(full))
+
+
+def forget_recent_posts(author_id) -> None:
+    cache.delete(RECENT_POSTS_KEY.format(author_id))
+
+
+def recent_posts(author_ids) -> list:
+    """Кэшированные списки (pub_date, id) последних постов авторов."""
+    keys = {RECENT_POSTS_KEY.format(author_id): author_id
+            for author_id in author_ids}
+    cached = cache.get_many(keys)
+    missing = {
+        key: list(
+            Post.objects.filter(author_id=author_id).order_by(
+                '-pub_date', '-id'
+            ).values_list('pub_date', 'id')[:settings.FOLLOW_FEED_RECENT]
+        )
+        for key, author_id in keys.items() if key not in cached
+    }
+    cache.set_many(missing, None)
+    cached.update(missing)
+    return list(cached.values())
+
+
+class MergedFeed:
+    """Лента подписок, собранная k-way слиянием списков авторов.
+
+    Списки длины FOLLOW_FEED_RECENT могут быть обрезаны, поэтому слияние
+    достоверно только до горизонта — самого свежего из последних элементов
+    обрезанных списков. Всё, что старше горизонта, читается запросом
+    через Follow.
+    """
+
+    def __init__(self, keys, tail=None, horizon=None, fallback=None):
+        self.keys = keys
+        self.tail = tail
+        self.horizon = horizon
+        self.fallback = fallback
+
+    @classmethod
+    def for_user(cls, user):
+        lists = recent_posts(
+            Follow.objects.filter(user=user).values_list(
+                'author_id', flat=True
+            )
+        )
+        truncated = [
+            posts[-1] for posts in lists
+            if len(posts) >= settings.FOLLOW_FEED_RECENT
+        ]
+        horizon = max(truncated, default=None)
+        keys = list(heapq.merge(*lists, reverse=True))
+        fallback = Post.objects.for_feed().filter(
+            author__following__user=user
+        )
+        tail = None
+        if horizon is not None:
+            keys = [key for key in keys if key >= horizon]
+            tail = keyset(fallback, horizon)
+        return cls(keys, tail, horizon, fallback)
+
+    def count(self) -> int:
+        if self.tail is None:
+            return len(self.keys)
+        return len(self.keys) + self.tail.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        posts = hydrate(self.keys[start:stop])
+        if self.tail is not None and (stop is None or stop > len(self.keys)):
+            head = len(self.keys)
+            posts += list(self.tail[
+                max(start - head, 0):None if stop is None else stop - head
+            ])
+        return posts
+
+    def seek(self, key=None, reverse=False):
+        if key is None and not reverse:
+            return self
+        if self.horizon is not None and (key is None or key < self.horizon):
+            return keyset(self.fallback, key, reverse)
+        if reverse:
+            return MergedFeed([item for item in self.keys[::-1] if item > key])
+        return MergedFeed(
+            [item for item in self.keys if item < key],
+            self.tail,
+            self.horizon,
+            self.fallback,
+        )
+
+
+def hydrate(keys) -> list:
+    posts = Post.objects.for_feed().in_bulk([pk for _, pk in keys])
+    return [posts[pk] for _, pk in keys if pk in posts]
+
+
+def follow_feed(user):
+    """Лента подписок и ключи её сортировки для пагинатора."""
+    if settings.FOLLOW_FEED_ENGINE == 'merge':
+        return MergedFeed.for_user(user), ('pub_date', 'id')
+    if settings.FOLLOW_FEED_ENGINE == 'timeline':
+        return (
+            FeedEntry.objects.filter(user=user).select_related(
+                'post__author', 'post__group'
+            ),
+            ('pub_date', 'post_id'),
+        )
+    return (
+        Post.objects.for_feed().filter(author__following__user=user),
+        ('pub_date', 'id'),
+    )
@@ -1,7 +1,77 @@
 from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
 from django.utils.translation import gettext_lazy as _
+from PIL import Image, ImageOps
 
-from .models import Post, Comment
+from .export import CHUNK_SIZE, COLUMNS, FORMATS
+from .models import Comment, Group, Post, User
+
+# Форматы, которые при перекодировании сохраняются в другой
+MAKE_FORMAT = {'MPO': 'JPEG'}
+SAVE_OPTIONS = {'JPEG': {'quality': 90}, 'WEBP': {'quality': 90}}
+
+
+def image_upload_error(upload):
+    """Ошибка размера загруженной картинки или None.
+
+    Размер в пикселях читается из заголовка, без декодирования.
+    Нераспознанный файл пропускается: его отклонит ImageField.
+    """
+    if (
+        getattr(upload, 'truncated', False)
+        or upload.size > settings.FILE_UPLOAD_MAX_SIZE
+    ):
+        return ValidationError(
+            _('Файл больше %(limit)s.'),
+            code='too_large',
+            params={'limit': filesizeformat(settings.FILE_UPLOAD_MAX_SIZE)},
+        )
+    too_many_pixels = ValidationError(
+        _('Картинка больше %(limit)s мегапикселей.'),
+        code='too_many_pixels',
+        params={'limit': settings.POST_IMAGE_MAX_PIXELS // 1_000_000},
+    )
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            width, height = image.size
+    except Image.DecompressionBombError:
+        return too_many_pixels
+    except Exception:
+        return None
+    finally:
+        upload.seek(0)
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        return too_many_pixels
+    return None
+
+
+def strip_exif(upload) -> None:
+    """Перекодирует картинку с EXIF прямо в загруженном файле.
+
+    Поворот из EXIF переносится в пиксели, цветовой профиль ICC
+    сохраняется, остальные метаданные, в том числе координаты съёмки,
+    отбрасываются.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        if 'exif' not in image.info or getattr(image, 'is_animated', False):
+            upload.seek(0)
+            return
+        image_format = MAKE_FORMAT.get(image.format, image.format)
+        options = dict(SAVE_OPTIONS.get(image_format, {}))
+        if image.info.get('icc_profile'):
+            options['icc_profile'] = image.info['icc_profile']
+        image = ImageOps.exif_transpose(image)
+    image.info.pop('exif', None)
+    upload.seek(0)
+    upload.truncate()
+    image.save(upload, image_format, **options)
+    upload.size = upload.tell()
+    upload.seek(0)
 
 
 class PostForm(forms.ModelForm):
@@ -13,6 +83,27 @@ class PostForm(forms.ModelForm):
             'group': _('Группа, к которой будет относиться пост'),
         }
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            error = image_upload_error(image)
+            if error:
+                raise error
+            strip_exif(image)
+        return image
+
+    def clean(self):
+        """Слишком большой файл не доходит до Pillow целиком, и ImageField
+        считает его испорченным; вместо этой ошибки выводится настоящая."""
+        cleaned_data = super().clean()
+        upload = self.files.get('image')
+        if upload is not None and 'image' in self.errors:
+            error = image_upload_error(upload)
+            if error:
+                del self.errors['image']
+                self.add_error('image', error)
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -21,3 +112,34 @@ class CommentForm(forms.ModelForm):
         help_text = {
             'text': _('Текст комментария'),
         }
+
+
+class ExportForm(forms.Form):
+    """Параметры выгрузки постов и комментариев."""
+    kind = forms.ChoiceField(
+        choices=[(kind, kind) for kind in COLUMNS], required=False
+    )
+    format = forms.ChoiceField(
+        choices=[(format, format) for format in FORMATS], required=False
+    )
+    since = forms.DateField(required=False)
+    until = forms.DateField(required=False)
+    group = forms.ModelChoiceField(
+        Group.objects, to_field_name='slug', required=False
+    )
+    author = forms.ModelChoiceField(
+        User.objects, to_field_name='username', required=False
+    )
+    chunk_size = forms.IntegerField(min_value=1, required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        since, until = cleaned_data.get('since'), cleaned_data.get('until')
+        if since and until and since > until:
+            raise ValidationError(_('Начало периода позже его конца.'))
+        cleaned_data['kind'] = cleaned_data.get('kind') or 'posts'
+        cleaned_data['format'] = cleaned_data.get('format') or 'ndjson'
+        cleaned_data['chunk_size'] = (
+            cleaned_data.get('chunk_size') or CHUNK_SIZE
+        )
+        return cleaned_data
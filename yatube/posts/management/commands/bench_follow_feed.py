@@ -0,0 +1,101 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.test.utils import override_settings
+
+from core.bench import bench_cache
+from posts import feeds
+from posts.models import Follow, Post, User
+
+ENGINES = ('join', 'timeline', 'merge')
+# форма графа подписок: имя -> число постов у каждого из авторов
+SHAPES = {
+    'prolific': [2000] * 5,
+    'wide': [20] * 500,
+    'mixed': [2000 // rank for rank in range(1, 51)],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает движки ленты подписок (join, timeline, merge) '
+        'на графах подписок разной формы. Данные создаются внутри '
+        'транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--shapes', default=','.join(SHAPES),
+            help='Формы графа через запятую: ' + ', '.join(SHAPES)
+        )
+        parser.add_argument('--pages', default='1,5')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    @bench_cache()
+    def handle(self, *args, **options):
+        pages = [int(number) for number in options['pages'].split(',')]
+        self.stdout.write(
+            f'{"shape":>10} {"page":>5} '
+            + ' '.join(f'{engine + ", ms":>12}' for engine in ENGINES)
+            + f' {"merge cold":>12}'
+        )
+        for shape in options['shapes'].split(','):
+            with transaction.atomic():
+                reader = self.build(shape, SHAPES[shape])
+                for number in pages:
+                    timings = [
+                        self.measure(reader, engine, number, options)
+                        for engine in ENGINES
+                    ]
+                    timings.append(self.measure(
+                        reader, 'merge', number, options, cold=True
+                    ))
+                    self.stdout.write(
+                        f'{shape:>10} {number:>5} '
+                        + ' '.join(f'{timing:>12.2f}' for timing in timings)
+                    )
+                transaction.set_rollback(True)
+        cache.clear()
+
+    def build(self, shape, sizes):
+        reader = User.objects.create(username=f'bench_{shape}_reader')
+        User.objects.bulk_create(
+            User(username=f'bench_{shape}_{number}')
+            for number in range(len(sizes))
+        )
+        authors = User.objects.filter(
+            username__startswith=f'bench_{shape}_'
+        ).exclude(pk=reader.pk).order_by('pk')
+        for author, size in zip(authors, sizes):
+            Post.objects.bulk_create(
+                Post(author=author, text=f'{shape} {number}')
+                for number in range(size)
+            )
+        Follow.objects.bulk_create(
+            Follow(user=reader, author=author) for author in authors
+        )
+        for author in authors:
+            feeds.backfill(reader.pk, author.pk)
+        return reader
+
+    def measure(self, reader, engine, number, options, cold=False):
+        best = float('inf')
+        with override_settings(FOLLOW_FEED_ENGINE=engine):
+            for _ in range(options['repeat']):
+                if cold:
+                    cache.clear()
+                started = time.perf_counter()
+                posts, _ = feeds.follow_feed(reader)
+                page = Paginator(posts, settings.POSTS_PER_PAGE).get_page(
+                    number
+                )
+                if engine == 'timeline':
+                    [entry.post for entry in page]
+                else:
+                    list(page)
+                best = min(best, time.perf_counter() - started)
+        return best * 1000
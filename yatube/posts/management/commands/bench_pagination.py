@@ -0,0 +1,77 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from posts.models import Post, User
+from posts.pagination import CursorPaginator, encode_cursor
+
+BATCH_SIZE = 5000
+PER_PAGE = 10
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает OFFSET- и keyset-пагинацию ленты на глубоких страницах. '
+        'Недостающие посты создаются внутри транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument(
+            '--pages', default='1,10,100,1000,10000,50000',
+            help='Номера страниц через запятую.'
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Не откатывать созданные для замера посты.'
+        )
+
+    def handle(self, *args, **options):
+        pages = [int(number) for number in options['pages'].split(',')]
+        with transaction.atomic():
+            self.fill(options['posts'])
+            posts = Post.objects.all()
+            self.stdout.write(
+                f'{"page":>8} {"offset, ms":>12} {"cursor, ms":>12}'
+            )
+            for number in pages:
+                offset, cursor = self.measure(
+                    posts, number, options['repeat']
+                )
+                self.stdout.write(
+                    f'{number:>8} {offset:>12.2f} {cursor:>12.2f}'
+                )
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def fill(self, total):
+        missing = total - Post.objects.count()
+        if missing <= 0:
+            return
+        author, _ = User.objects.get_or_create(username='bench_pagination')
+        self.stdout.write(f'Создаю {missing} постов...')
+        for start in range(0, missing, BATCH_SIZE):
+            Post.objects.bulk_create(
+                Post(author=author, text=f'bench {number}')
+                for number in range(start, min(start + BATCH_SIZE, missing))
+            )
+
+    def measure(self, posts, number, repeat):
+        anchor = None
+        if number > 1:
+            anchor = posts.order_by('-pub_date', '-id')[
+                (number - 1) * PER_PAGE - 1
+            ]
+        token = anchor and encode_cursor(anchor)
+        offset = cursor = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(Paginator(posts, PER_PAGE).page(number))
+            offset = min(offset, time.perf_counter() - started)
+            started = time.perf_counter()
+            list(CursorPaginator(posts, PER_PAGE).get_page(after=token))
+            cursor = min(cursor, time.perf_counter() - started)
+        return offset * 1000, cursor * 1000
@@ -0,0 +1,69 @@
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.search import find_posts
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск по полнотекстовому индексу с LIKE-сканом, '
+        'которым искала админка: число найденных постов и первая страница.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--terms', default='',
+            help='Запросы через запятую; по умолчанию — слова из постов.'
+        )
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        terms = [term for term in options['terms'].split(',') if term]
+        if not terms:
+            terms = self.sample_terms()
+        self.stdout.write(
+            f'{"query":>24} {"like":>8} {"like, ms":>10} '
+            f'{"fts":>8} {"fts, ms":>10}'
+        )
+        for term in terms:
+            like = Post.objects.filter(text__icontains=term)
+            fts = find_posts(term)
+            found = [like.count(), fts.count()]
+            timings = [
+                self.measure(posts, options['repeat'])
+                for posts in (like, fts)
+            ]
+            self.stdout.write(
+                f'{term:>24} {found[0]:>8} {timings[0]:>10.2f} '
+                f'{found[1]:>8} {timings[1]:>10.2f}'
+            )
+
+    def sample_terms(self) -> list:
+        """Частое, среднее и редкое слово из последних постов."""
+        words = Counter(
+            word.lower()
+            for text in Post.objects.values_list('text', flat=True)[:1000]
+            for word in re.findall(r'\w{4,}', text)
+        ).most_common()
+        if not words:
+            return []
+        return [
+            words[0][0],
+            words[len(words) // 2][0],
+            words[-1][0],
+        ]
+
+    def measure(self, posts, repeat) -> float:
+        """Лучшее время подсчёта и первой страницы, как у паджинатора."""
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            posts.count()
+            list(posts[:settings.POSTS_PER_PAGE])
+            best = min(best, time.perf_counter() - started)
+        return best * 1000
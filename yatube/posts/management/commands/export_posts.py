@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import CHUNK_SIZE, COLUMNS, FORMATS, stream
+from posts.forms import ExportForm
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты или комментарии в NDJSON или CSV потоком, '
+        'не собирая выгрузку в памяти.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=COLUMNS, default='posts')
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument(
+            '--since', help='Дата ГГГГ-ММ-ДД, с которой выгружать.'
+        )
+        parser.add_argument(
+            '--until', help='Дата ГГГГ-ММ-ДД, по которую выгружать.'
+        )
+        parser.add_argument('--group', help='slug группы.')
+        parser.add_argument('--author', help='Имя пользователя автора.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Сколько строк читать из базы за раз.'
+        )
+        parser.add_argument(
+            '--output', help='Файл для выгрузки; без него — stdout.'
+        )
+
+    def handle(self, *args, **options):
+        form = ExportForm({
+            name: options[name] for name in (
+                'kind', 'format', 'since', 'until', 'group', 'author',
+                'chunk_size',
+            )
+            if options[name] is not None
+        })
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+        if options['output']:
+            with open(
+                options['output'], 'w', encoding='utf-8', newline=''
+            ) as file:
+                for chunk in stream(**form.cleaned_data):
+                    file.write(chunk)
+        else:
+            for chunk in stream(**form.cleaned_data):
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.thumbnails import drain
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры и варианты картинок из очереди ThumbnailJob.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int,
+            help='Выполнить не больше стольких задач за проход.'
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Не выходить, а проверять очередь снова.'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Пауза между проходами с пустой очередью, в секундах.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            done = drain(options['limit'])
+            if done:
+                self.stdout.write(f'Картинок: {done}')
+            if not options['loop']:
+                return
+            if not done:
+                time.sleep(options['interval'])
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново строит полнотекстовый индекс постов и восстанавливает '
+        'триггеры, которые его обновляют.'
+    )
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError('Полнотекстовый индекс есть только в SQLite.')
+        started = time.perf_counter()
+        search.rebuild()
+        self.stdout.write(
+            f'Проиндексировано постов: {Post.objects.count()} '
+            f'за {time.perf_counter() - started:.1f} с'
+        )
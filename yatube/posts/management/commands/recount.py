@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import AuthorStats, User
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики авторов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пересчитать только указанных пользователей.'
+        )
+
+    def handle(self, *args, **options):
+        users = None
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+        total = AuthorStats.objects.recount(users)
+        self.stdout.write(f'Пересчитано авторов: {total}')
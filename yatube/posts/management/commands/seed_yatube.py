@@ -0,0 +1,249 @@
+import random
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from faker import Faker
+
+from posts import feeds
+from posts.models import AuthorStats, Comment, Follow, Group, Post, User
+
+TEXT_POOL = 2000
+
+
+@contextmanager
+def manual_dates(*fields):
+    """Отключает auto_now_add, чтобы bulk_create сохранил заданные даты."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def power_law(size, alpha, rng) -> list:
+    """Накопленные веса Ципфа для случайно перемешанных рангов."""
+    weights = [1 / (rank ** alpha) for rank in range(1, size + 1)]
+    rng.shuffle(weights)
+    return list(accumulate(weights))
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическим социальным графом: пользователи, '
+        'группы, посты, комментарии и подписки со степенными '
+        'распределениями. Результат детерминирован при одинаковом --seed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--comments', type=int, default=1_000_000)
+        parser.add_argument('--follows', type=int, default=200_000)
+        parser.add_argument(
+            '--author-skew', type=float, default=1.1,
+            help='Показатель степени для числа постов у авторов.'
+        )
+        parser.add_argument(
+            '--follower-skew', type=float, default=1.2,
+            help='Показатель степени для числа подписчиков у авторов.'
+        )
+        parser.add_argument(
+            '--group-skew', type=float, default=1.0,
+            help='Показатель степени для размеров групп.'
+        )
+        parser.add_argument(
+            '--comment-skew', type=float, default=1.0,
+            help='Показатель степени для числа комментариев к постам.'
+        )
+        parser.add_argument(
+            '--ungrouped', type=float, default=0.3,
+            help='Доля постов без группы.'
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument(
+            '--until', default='2022-03-01',
+            help='Дата самого свежего поста, ГГГГ-ММ-ДД.'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help='Не пересчитывать счётчики авторов и ленты подписок.'
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        until = timezone.make_aware(
+            datetime.strptime(options['until'], '%Y-%m-%d')
+        )
+        self.since = until - timedelta(days=options['days'])
+        self.span = (until - self.since).total_seconds()
+        self.texts = [
+            self.fake.sentence(nb_words=12) for _ in range(TEXT_POOL)
+        ]
+        started = time.perf_counter()
+        with manual_dates(
+            Post._meta.get_field('pub_date'),
+            Comment._meta.get_field('created'),
+        ):
+            users = self.seed_users()
+            groups = self.seed_groups()
+            posts, dates = self.seed_posts(users, groups)
+            self.seed_comments(users, posts, dates)
+            readers = self.seed_follows(users)
+        if not options['skip_derived']:
+            self.timed('stats', len(users), AuthorStats.objects.recount)
+            self.timed(
+                'timelines', len(readers), feeds.rebuild, sorted(readers)
+            )
+            cache.delete_many(
+                [feeds.RECENT_POSTS_KEY.format(pk) for pk in users]
+            )
+        self.stdout.write(
+            f'Готово за {time.perf_counter() - started:.1f} с'
+        )
+
+    def timed(self, name, total, function, *args):
+        started = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{name:>10}: {total:>10} строк за {elapsed:7.1f} с '
+            f'({total / max(elapsed, 1e-9):,.0f} строк/с)'
+        )
+
+    def insert(self, name, model, total, build):
+        """Вставляет total строк пачками, build(start, stop) — генератор."""
+        def run():
+            for start in range(0, total, self.batch_size):
+                stop = min(start + self.batch_size, total)
+                with transaction.atomic():
+                    model.objects.bulk_create(
+                        build(start, stop), ignore_conflicts=True
+                    )
+        last_id = model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        self.timed(name, total, run)
+        return last_id
+
+    def new_ids(self, model, last_id) -> array:
+        return array('q', model.objects.filter(pk__gt=last_id).order_by(
+            'pk'
+        ).values_list('pk', flat=True).iterator())
+
+    def date(self, since=None):
+        since = since or self.since.timestamp()
+        until = self.since.timestamp() + self.span
+        return since + self.rng.random() * (until - since)
+
+    def seed_users(self) -> array:
+        password = make_password(None)
+        prefix = f's{self.options["seed"]}_'
+
+        def build(start, stop):
+            for number in range(start, stop):
+                yield User(
+                    username=f'{prefix}{self.fake.user_name()}_{number}',
+                    first_name=self.fake.first_name(),
+                    last_name=self.fake.last_name(),
+                    password=password,
+                )
+        last_id = self.insert('users', User, self.options['users'], build)
+        return self.new_ids(User, last_id)
+
+    def seed_groups(self) -> array:
+        prefix = f's{self.options["seed"]}-'
+
+        def build(start, stop):
+            for number in range(start, stop):
+                word = self.fake.word()
+                yield Group(
+                    title=word.capitalize(),
+                    slug=f'{prefix}{number}',
+                    description=self.fake.sentence(),
+                )
+        last_id = self.insert('groups', Group, self.options['groups'], build)
+        return self.new_ids(Group, last_id)
+
+    def seed_posts(self, users, groups):
+        authors = power_law(len(users), self.options['author_skew'], self.rng)
+        sizes = power_law(len(groups), self.options['group_skew'], self.rng)
+
+        def build(start, stop):
+            count = stop - start
+            picked = self.rng.choices(users, cum_weights=authors, k=count)
+            in_group = [None] * count
+            if groups:
+                in_group = self.rng.choices(groups, cum_weights=sizes, k=count)
+            for author, group in zip(picked, in_group):
+                if self.rng.random() < self.options['ungrouped']:
+                    group = None
+                yield Post(
+                    author_id=author,
+                    group_id=group,
+                    text=self.rng.choice(self.texts),
+                    pub_date=datetime.fromtimestamp(
+                        self.date(), tz=timezone.utc
+                    ),
+                )
+        last_id = self.insert('posts', Post, self.options['posts'], build)
+        posts, dates = array('q'), array('d')
+        for pk, pub_date in Post.objects.filter(pk__gt=last_id).order_by(
+            'pk'
+        ).values_list('pk', 'pub_date').iterator():
+            posts.append(pk)
+            dates.append(pub_date.timestamp())
+        return posts, dates
+
+    def seed_comments(self, users, posts, dates) -> None:
+        if not posts:
+            return
+        popular = power_law(len(posts), self.options['comment_skew'], self.rng)
+        indexes = range(len(posts))
+
+        def build(start, stop):
+            count = stop - start
+            picked = self.rng.choices(indexes, cum_weights=popular, k=count)
+            for index in picked:
+                yield Comment(
+                    post_id=posts[index],
+                    author_id=self.rng.choice(users),
+                    text=self.rng.choice(self.texts)[:200],
+                    created=datetime.fromtimestamp(
+                        self.date(dates[index]), tz=timezone.utc
+                    ),
+                )
+        self.insert('comments', Comment, self.options['comments'], build)
+
+    def seed_follows(self, users) -> set:
+        popular = power_law(
+            len(users), self.options['follower_skew'], self.rng
+        )
+        readers = set()
+
+        def build(start, stop):
+            count = stop - start
+            picked = self.rng.choices(users, cum_weights=popular, k=count)
+            for author in picked:
+                user = self.rng.choice(users)
+                if user != author:
+                    readers.add(user)
+                    yield Follow(user_id=user, author_id=author)
+        self.insert('follows', Follow, self.options['follows'], build)
+        return readers
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts.thumbnails import sweep
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки, на которые не ссылается ни один пост, '
+        'с их миниатюрами и вариантами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int, default=60 * 60,
+            help='Не трогать файлы моложе стольких секунд.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что было бы удалено.'
+        )
+
+    def handle(self, *args, **options):
+        removed = sweep(options['min_age'], dry_run=options['dry_run'])
+        for name in removed:
+            self.stdout.write(name)
+        self.stdout.write(f'Файлов: {len(removed)}')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.feeds import trim_all
+
+
+class Command(BaseCommand):
+    help = (
+        'Обрезает ленты подписок до FOLLOW_FEED_LENGTH последних постов. '
+        'Запускается периодически, например из cron.'
+    )
+
+    def handle(self, *args, **options):
+        trimmed = trim_all()
+        self.stdout.write(f'Обрезано лент: {len(trimmed)}')
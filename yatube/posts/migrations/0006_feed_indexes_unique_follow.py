@@ -0,0 +1,72 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:46
+
+from django.db import migrations, models
+import django.db.models.expressions
+
+
+def drop_duplicate_follows(apps, schema_editor):
+    """Удаляет повторные подписки и подписки на себя.
+
+    0004 и 0005 уже разложили их по лентам и посчитали в AuthorStats,
+    поэтому ленты затронутых читателей чистятся, а их счётчики и счётчики
+    авторов пересчитываются.
+    """
+    Follow = apps.get_model('posts', 'Follow')
+    FeedEntry = apps.get_model('posts', 'FeedEntry')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    keep = Follow.objects.values('user', 'author').annotate(
+        first=models.Min('id')
+    ).values('first')
+    dropped = Follow.objects.filter(
+        models.Q(user=models.F('author')) | ~models.Q(id__in=keep)
+    )
+    rows = list(dropped.values_list('user', 'author'))
+    if not rows:
+        return
+    dropped.delete()
+    readers = {user_id for user_id, _ in rows}
+    FeedEntry.objects.filter(user__in=readers).annotate(
+        followed=models.Exists(Follow.objects.filter(
+            user=models.OuterRef('user'),
+            author=models.OuterRef('post__author'),
+        ))
+    ).filter(followed=False).delete()
+    counters = {'followers_count': 'author', 'following_count': 'user'}
+    for user_id in readers | {author_id for _, author_id in rows}:
+        AuthorStats.objects.filter(user_id=user_id).update(**{
+            field: Follow.objects.filter(**{lookup: user_id}).count()
+            for field, lookup in counters.items()
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_author_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            drop_duplicate_follows, migrations.RunPython.noop
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='post_author_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='post_group_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='post_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.CheckConstraint(check=models.Q(_negated=True, user=django.db.models.expressions.F('author')), name='no_self_follow'),
+        ),
+    ]
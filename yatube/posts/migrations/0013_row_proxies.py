@@ -0,0 +1,35 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_thumbnail_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentRow',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('posts.comment',),
+        ),
+        migrations.CreateModel(
+            name='FollowRow',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('posts.follow',),
+        ),
+    ]
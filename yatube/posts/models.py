@@ -1,7 +1,46 @@
-from django.db import models
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from core.storage import ContentAddressedStorage
 
 User = get_user_model()
+# Картинки постов: одинаковые файлы хранятся в одном экземпляре
+post_images = ContentAddressedStorage()
+# Больше стольких периодов PostQuerySet.pub_dates() не проверяет поштучно.
+DATE_PROBES = 100
+
+
+def next_period(start, kind) -> date:
+    """Начало периода kind, следующего за тем, что начинается в start."""
+    if kind == 'day':
+        return start + timedelta(days=1)
+    if kind == 'year':
+        return date(start.year + 1, 1, 1)
+    return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def periods(first, last, kind):
+    """Начала периодов kind, покрывающих даты от first до last."""
+    start = {
+        'year': date(first.year, 1, 1),
+        'month': date(first.year, first.month, 1),
+        'day': first,
+    }[kind]
+    while start <= last:
+        yield start
+        start = next_period(start, kind)
+
+
+def start_of(day):
+    moment = datetime.combine(day, datetime.min.time())
+    return timezone.make_aware(moment) if settings.USE_TZ else moment
 
 
 class Group(models.Model):
@@ -13,6 +52,52 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты вместе с автором и группой, которые выводит карточка."""
+        return self.select_related('author', 'group')
+
+    def pub_dates(self, kind, order='ASC') -> list:
+        """То же, что dates('pub_date', kind), без DISTINCT по всей выборке.
+
+        dates() усекает дату каждой строки, то есть просматривает всю
+        выборку; здесь каждый период между первой и последней датой
+        проверяется exists() по индексу pub_date. Нужна навигации по датам
+        в админке (admin.DateHierarchyQuerySet). Возвращает список.
+        """
+        field_name = 'pub_date'
+        # MIN и MAX в одном запросе SQLite считает просмотром индекса,
+        # а по отдельности — поиском по его краям
+        bounds = [
+            self.order_by(ordering).values_list(field_name, flat=True)[:1]
+            for ordering in (field_name, f'-{field_name}')
+        ]
+        if not bounds[0]:
+            return []
+        first, last = (
+            timezone.localtime(bound[0]).date()
+            if settings.USE_TZ else bound[0].date()
+            for bound in bounds
+        )
+        starts = list(islice(periods(first, last, kind), DATE_PROBES + 1))
+        if len(starts) > DATE_PROBES:
+            # базовая версия: dates() выборки может вызывать pub_dates()
+            return list(
+                models.QuerySet.dates(self, field_name, kind, order)
+            )
+        # границы периода идут в WHERE первыми: из нескольких условий
+        # на pub_date SQLite ищет по индексу по первым, а фильтр по году
+        # из админки шире периода
+        found = [
+            start for start in starts
+            if (self.model._default_manager.filter(
+                pub_date__gte=start_of(start),
+                pub_date__lt=start_of(next_period(start, kind)),
+            ) & self).exists()
+        ]
+        return found[::-1] if order == 'DESC' else found
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name='Текст поста')
     pub_date = models.DateTimeField(auto_now_add=True)
@@ -33,11 +118,28 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=post_images,
         blank=True
     )
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx',
+            ),
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_date_idx',
+            ),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -45,6 +147,46 @@ class Post(models.Model):
         return self.text[:15]
 
 
+class ImageVariant(models.Model):
+    """Уменьшенная копия картинки поста для srcset.
+
+    Привязана к имени файла картинки, а не к посту: одну картинку
+    могут показывать несколько постов.
+    """
+    source = models.CharField('Картинка', max_length=255)
+    width = models.PositiveIntegerField('Ширина')
+    height = models.PositiveIntegerField('Высота')
+    format = models.CharField('Формат', max_length=10)
+    file = models.FileField('Файл', max_length=255)
+    size = models.PositiveIntegerField('Размер, байт')
+
+    class Meta:
+        ordering = ['source', 'format', 'width']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source', 'format', 'width'],
+                name='unique_image_variant',
+            ),
+        ]
+        verbose_name = 'Вариант картинки'
+        verbose_name_plural = 'Варианты картинок'
+
+
+class ThumbnailJob(models.Model):
+    """Картинка, для которой ещё не созданы миниатюры и варианты.
+
+    Запросы только добавляют запись, а создаёт миниатюры пул потоков
+    или команда process_thumbnails.
+    """
+    name = models.CharField('Картинка', max_length=255, unique=True)
+    created = models.DateTimeField('Поставлена', auto_now_add=True)
+
+    class Meta:
+        ordering = ['created', 'id']
+        verbose_name = 'Задача миниатюр'
+        verbose_name_plural = 'Очередь миниатюр'
+
+
 class Comment(models.Model):
     post = models.ForeignKey(
         Post,
@@ -61,6 +203,14 @@ class Comment(models.Model):
     text = models.TextField('Текст коммента', max_length=200)
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx',
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -75,3 +225,138 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='Автор блога',
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow',
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='no_self_follow',
+            ),
+        ]
+
+
+class CommentRow(Comment):
+    """Комментарий, на удаление которого не подписан ни один сигнал.
+
+    QuerySet.delete() такой выборки — один DELETE без загрузки строк;
+    счётчики, ленты и поколения кэша поправляет вызывающий код.
+    """
+
+    class Meta:
+        proxy = True
+
+
+class FollowRow(Follow):
+    """Подписка, на удаление которой не подписан ни один сигнал."""
+
+    class Meta:
+        proxy = True
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date', '-post_id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_entry_user_date_idx',
+            ),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+
+
+def count_by(model, field):
+    """Подзапрос с количеством строк model, ссылающихся на пользователя."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')}).order_by()
+            .values(field).annotate(total=Count('pk')).values('total')
+        ),
+        0,
+    )
+
+
+class AuthorStatsManager(models.Manager):
+    COUNTERS = {
+        'posts_count': (Post, 'author'),
+        'followers_count': (Follow, 'author'),
+        'following_count': (Follow, 'user'),
+        'comments_count': (Comment, 'author'),
+    }
+
+    def bump(self, user_id, **deltas) -> None:
+        """Сдвигает счётчики; отсутствующую строку досчитает recount."""
+        self.filter(user_id=user_id).update(**{
+            field: Greatest(F(field) + delta, 0)
+            for field, delta in deltas.items()
+        })
+
+    def recount(self, users=None, batch_size=1000) -> int:
+        """Пересчитывает счётчики агрегатами и перезаписывает строки."""
+        users = User.objects.all() if users is None else users
+        pks = list(users.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(pks), batch_size):
+            batch = pks[start:start + batch_size]
+            rows = User.objects.filter(pk__in=batch).annotate(**{
+                field: count_by(model, lookup)
+                for field, (model, lookup) in self.COUNTERS.items()
+            }).values_list('pk', *self.COUNTERS)
+            with transaction.atomic():
+                self.filter(user_id__in=batch).delete()
+                self.bulk_create(
+                    self.model(user_id=pk, **dict(zip(self.COUNTERS, counts)))
+                    for pk, *counts in rows
+                )
+        return len(pks)
+
+    def for_user(self, user):
+        try:
+            return self.get(user=user)
+        except self.model.DoesNotExist:
+            self.recount(User.objects.filter(pk=user.pk))
+            return self.get(user=user)
+
+
+class AuthorStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор',
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
+
+    objects = AuthorStatsManager()
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
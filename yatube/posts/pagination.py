@@ -0,0 +1,194 @@
+import base64
+import binascii
+
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+KEYS = ('pub_date', 'id')
+# Больше этого числа строк отфильтрованный список не пересчитывается.
+COUNT_LIMIT = 100_000
+
+
+def encode_cursor(obj, keys=KEYS) -> str:
+    """Непрозрачный токен позиции объекта или словаря из values()."""
+    if isinstance(obj, dict):
+        date, pk = (obj[key] for key in keys)
+    else:
+        date, pk = (getattr(obj, key) for key in keys)
+    raw = f'{date.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Разбирает токен в пару (pub_date, id), мусор превращает в None."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        date, pk = raw.split('|')
+        date = parse_datetime(date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+    if date is None:
+        return None
+    return date, pk
+
+
+def keyset(objects, key=None, reverse=False, keys=KEYS):
+    """Объекты строго после (или до, при reverse) позиции key."""
+    date_key, id_key = keys
+    if key is not None:
+        date, pk = key
+        lookup = 'gt' if reverse else 'lt'
+        objects = objects.filter(
+            Q(**{f'{date_key}__{lookup}e': date}),
+            Q(**{f'{date_key}__{lookup}': date})
+            | Q(**{f'{id_key}__{lookup}': pk}),
+        )
+    if reverse:
+        return objects.order_by(date_key, id_key)
+    return objects.order_by(f'-{date_key}', f'-{id_key}')
+
+
+class CursorPage(Page):
+    """Страница ленты без номера: соседние страницы задаются токенами."""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        super().__init__(object_list, 1, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по паре (pub_date, id).
+
+    Каждая страница — это диапазонное чтение по индексу от позиции курсора,
+    поэтому глубина ленты не влияет на стоимость запроса, а COUNT(*) не
+    выполняется вовсе. Источник с собственным методом seek(key, reverse)
+    (например, feeds.MergedFeed) листается через него.
+    """
+
+    def __init__(self, object_list, per_page, keys=KEYS):
+        super().__init__(object_list, per_page)
+        self.keys = keys
+
+    def seek(self, key=None, reverse=False):
+        seek = getattr(self.object_list, 'seek', None)
+        if seek is not None:
+            return seek(key, reverse)
+        return keyset(self.object_list, key, reverse, self.keys)
+
+    def get_page(self, after=None, before=None):
+        after, before = decode_cursor(after), decode_cursor(before)
+        if before is not None:
+            rows = list(self.seek(before, reverse=True)[:self.per_page + 1])
+            if len(rows) > self.per_page:
+                rows = rows[self.per_page - 1::-1]
+                return self._cursor_page(rows, True, True)
+            after = None
+        rows = list(self.seek(after)[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return self._cursor_page(
+            rows[:self.per_page], has_next, after is not None
+        )
+
+    def _cursor_page(self, rows, has_next, has_previous):
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = encode_cursor(rows[-1], self.keys)
+        if rows and has_previous:
+            previous_cursor = encode_cursor(rows[0], self.keys)
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+
+def page_state(page) -> dict:
+    """Номер, число строк или курсоры страницы и id её объектов.
+
+    Лёгкая замена странице в кэше: объекты и queryset паджинатора
+    в него не попадают.
+    """
+    state = {
+        'ids': [obj.pk for obj in page],
+        'per_page': page.paginator.per_page,
+    }
+    if getattr(page, 'is_cursor', False):
+        state['cursors'] = (page.next_cursor, page.previous_cursor)
+    else:
+        state.update(number=page.number, count=page.paginator.count)
+    return state
+
+
+def restore_page(state, objects) -> Page:
+    """Страница из page_state() поверх выборки objects.
+
+    Номера и курсоры берутся из состояния без запросов; объекты
+    читаются одним запросом, только если к ним обратятся.
+    """
+    rows = objects.filter(pk__in=state['ids'])
+    if 'cursors' in state:
+        return CursorPage(
+            rows, CursorPaginator(objects, state['per_page']),
+            *state['cursors']
+        )
+    paginator = Paginator(objects, state['per_page'])
+    paginator.count = state['count']
+    return Page(rows, state['number'], paginator)
+
+
+def estimate_rows(model, using):
+    """Оценка числа строк таблицы без COUNT(*) или None, если её нет.
+
+    В SQLite это размах rowid — с удалениями он завышает оценку, зато
+    всегда свеж и читается по краям B-дерева; в PostgreSQL — статистика
+    pg_class.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                f'SELECT (SELECT MAX(rowid) FROM {table}) '
+                f'- (SELECT MIN(rowid) FROM {table}) + 1'
+            )
+            return cursor.fetchone()[0] or 0
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [model._meta.db_table]
+            )
+            row = cursor.fetchone()
+            if row and row[0] >= 0:
+                return int(row[0])
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator для больших таблиц, который не делает точный COUNT(*).
+
+    Для нефильтрованного списка число строк оценивается, отфильтрованный
+    считается не дальше COUNT_LIMIT строк.
+    """
+
+    @cached_property
+    def count(self):
+        objects = self.object_list
+        if not objects.query.where:
+            estimate = estimate_rows(objects.model, objects.db)
+            if estimate is not None:
+                return estimate
+        return objects.order_by()[:COUNT_LIMIT].count()
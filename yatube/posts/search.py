@@ -0,0 +1,99 @@
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .models import Post
+
+SEARCH_TABLE = 'posts_post_fts'
+POSTS_TABLE = Post._meta.db_table
+# Индекс хранит только токены, текст берётся из posts_post по rowid.
+# Триггеры держат его в согласии с таблицей, в том числе после
+# bulk_create и update(), которые обходят сигналы.
+SCHEMA = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    f"text, content='{POSTS_TABLE}', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert "
+    f"AFTER INSERT ON {POSTS_TABLE} BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, text) VALUES (new.id, new.text); "
+    f"END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete "
+    f"AFTER DELETE ON {POSTS_TABLE} BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, text) "
+    f"VALUES ('delete', old.id, old.text); "
+    f"END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update "
+    f"AFTER UPDATE OF text ON {POSTS_TABLE} BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, text) "
+    f"VALUES ('delete', old.id, old.text); "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, text) VALUES (new.id, new.text); "
+    f"END",
+)
+DROP = (
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_delete',
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_update',
+    f'DROP TABLE IF EXISTS {SEARCH_TABLE}',
+)
+
+
+def available(using=DEFAULT_DB_ALIAS) -> bool:
+    return connections[using].vendor == 'sqlite'
+
+
+def _execute(statements, using) -> None:
+    with connections[using].cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def install(using=DEFAULT_DB_ALIAS) -> None:
+    """Создаёт индекс и триггеры, если их нет.
+
+    SQLite пересоздаёт таблицу при изменении её схемы и теряет при этом
+    триггеры, поэтому install() вызывается после каждой миграции.
+    """
+    if available(using):
+        _execute(SCHEMA, using)
+
+
+def uninstall(using=DEFAULT_DB_ALIAS) -> None:
+    if available(using):
+        _execute(DROP, using)
+
+
+def rebuild(using=DEFAULT_DB_ALIAS) -> None:
+    """Заново строит индекс по всем постам."""
+    if available(using):
+        install(using)
+        _execute(
+            [f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')"],
+            using
+        )
+
+
+def match_expression(query) -> str:
+    """Слова запроса в кавычках: синтаксис FTS5 пользователю недоступен."""
+    return ' '.join(f'"{word}"' for word in re.findall(r'\w+', query))
+
+
+def find_posts(query, posts=None):
+    """Посты, содержащие все слова запроса, от самых релевантных."""
+    if posts is None:
+        posts = Post.objects.all()
+    expression = match_expression(query)
+    if not expression:
+        return posts.none()
+    if not available(posts.db):
+        for word in re.findall(r'\w+', query):
+            posts = posts.filter(text__icontains=word)
+        return posts
+    return posts.extra(
+        select={'rank': f'{SEARCH_TABLE}.rank'},
+        tables=[SEARCH_TABLE],
+        where=[
+            f'{SEARCH_TABLE}.rowid = {POSTS_TABLE}.id',
+            f'{SEARCH_TABLE} MATCH %s',
+        ],
+        params=[expression],
+    ).order_by('rank', '-pub_date', '-id')
@@ -0,0 +1,229 @@
+from django.db import connections
+from django.db.models.signals import (
+    post_delete, post_migrate, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from . import feeds, search, thumbnails
+from .caching import (
+    FOLLOW, GROUP, INDEX, POST, PROFILE, bump, post_scopes
+)
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+# Поля пользователя, которые выводят страницы
+USER_SHOWN_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+def followers_of(author_id) -> list:
+    return list(
+        Follow.objects.filter(author_id=author_id).values_list(
+            'user_id', flat=True
+        )
+    )
+
+
+def author_scopes(user_id, usernames) -> list:
+    """Области страниц, где видны имя или карточки пользователя."""
+    scopes = [INDEX]
+    scopes.extend(PROFILE.format(username=name) for name in usernames)
+    scopes.extend(
+        GROUP.format(slug=slug) for slug in Group.objects.filter(
+            posts__author_id=user_id
+        ).values_list('slug', flat=True).distinct()
+    )
+    scopes.extend(
+        FOLLOW.format(user_id=follower)
+        for follower in followers_of(user_id)
+    )
+    scopes.extend(
+        POST.format(post_id=post_id) for post_id in Comment.objects.filter(
+            author_id=user_id
+        ).values_list('post_id', flat=True).distinct()
+    )
+    return scopes
+
+
+def group_scopes(group, slugs) -> list:
+    """Области страниц, где видны посты группы со ссылкой на неё."""
+    scopes = [GROUP.format(slug=slug) for slug in slugs]
+    scopes.append(INDEX)
+    scopes.extend(
+        PROFILE.format(username=username) for username in User.objects.filter(
+            posts__group=group
+        ).values_list('username', flat=True).distinct()
+    )
+    scopes.extend(
+        FOLLOW.format(user_id=user_id) for user_id in Follow.objects.filter(
+            author__posts__group=group
+        ).values_list('user_id', flat=True).distinct()
+    )
+    return scopes
+
+
+@receiver(pre_save, sender=User)
+def user_changing(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not USER_SHOWN_FIELDS & set(
+        update_fields
+    ):
+        # например, last_login при входе
+        return
+    instance.previously_shown = User.objects.filter(
+        pk=instance.pk
+    ).values(*USER_SHOWN_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        AuthorStats.objects.get_or_create(user=instance)
+        return
+    previous = getattr(instance, 'previously_shown', None)
+    if previous is None or all(
+        previous[field] == getattr(instance, field)
+        for field in USER_SHOWN_FIELDS
+    ):
+        return
+    bump(*author_scopes(
+        instance.pk, {previous['username'], instance.username}
+    ))
+
+
+@receiver(pre_save, sender=Group)
+def group_changing(sender, instance, raw=False, **kwargs):
+    if not raw and not instance._state.adding:
+        instance.previous_slug = Group.objects.filter(
+            pk=instance.pk
+        ).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw=False, **kwargs):
+    """Название и описание видны на странице группы и постов в ней.
+
+    Посты группы входят в её область через post_detail; смена slug
+    меняет ещё и ссылки в карточках всех лент.
+    """
+    if raw or created:
+        return
+    previous = getattr(instance, 'previous_slug', None)
+    if previous and previous != instance.slug:
+        bump(*group_scopes(instance, {previous, instance.slug}))
+    else:
+        bump(GROUP.format(slug=instance.slug))
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    # после удаления у постов group уже NULL, и их авторов не найти
+    instance.deleted_scopes = group_scopes(instance, {instance.slug})
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    bump(*getattr(
+        instance, 'deleted_scopes', [GROUP.format(slug=instance.slug)]
+    ))
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, raw=False, **kwargs):
+    if not raw and not instance._state.adding:
+        instance.previous_group_slug, instance.previous_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group__slug', 'image'
+            ).first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    # правка только текста не ставит миниатюры в очередь заново:
+    # иначе их готовность ещё раз сбросила бы кэш лент
+    if instance.image and (
+        created
+        or instance.image.name != getattr(instance, 'previous_image', None)
+    ):
+        thumbnails.enqueue(instance.image.name)
+    if created:
+        AuthorStats.objects.bump(instance.author_id, posts_count=1)
+        followers = feeds.fan_out(instance)
+        feeds.forget_recent_posts(instance.author_id)
+        bump(*post_scopes(instance, followers))
+        return
+    scopes = post_scopes(instance, followers_of(instance.author_id))
+    previous = getattr(instance, 'previous_group_slug', None)
+    if previous:
+        scopes.append(GROUP.format(slug=previous))
+    bump(*scopes)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    AuthorStats.objects.bump(instance.author_id, posts_count=-1)
+    feeds.forget_recent_posts(instance.author_id)
+    bump(*post_scopes(instance, followers_of(instance.author_id)))
+
+
+@receiver(thumbnails.thumbnails_ready)
+def thumbnails_created(sender, name, **kwargs):
+    """Страницы с картинкой пересобираются уже с миниатюрой."""
+    for post in Post.objects.filter(image=name).select_related(
+        'author', 'group'
+    ):
+        bump(*post_scopes(post, followers_of(post.author_id)))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.bump(instance.author_id, comments_count=1)
+        bump(PROFILE.format(username=instance.author.username))
+    bump(POST.format(post_id=instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    AuthorStats.objects.bump(instance.author_id, comments_count=-1)
+    bump(
+        PROFILE.format(username=instance.author.username),
+        POST.format(post_id=instance.post_id),
+    )
+
+
+def follow_scopes(follow) -> list:
+    return [
+        FOLLOW.format(user_id=follow.user_id),
+        PROFILE.format(username=follow.user.username),
+        PROFILE.format(username=follow.author.username),
+    ]
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.bump(instance.user_id, following_count=1)
+        AuthorStats.objects.bump(instance.author_id, followers_count=1)
+        feeds.backfill(instance.user_id, instance.author_id)
+        bump(*follow_scopes(instance))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    AuthorStats.objects.bump(instance.user_id, following_count=-1)
+    AuthorStats.objects.bump(instance.author_id, followers_count=-1)
+    feeds.clean_up(instance.user_id, instance.author_id)
+    bump(*follow_scopes(instance))
+
+
+@receiver(post_migrate)
+def search_installed(sender, using, **kwargs):
+    if sender.name != 'posts':
+        return
+    if search.POSTS_TABLE in connections[using].introspection.table_names():
+        search.install(using)
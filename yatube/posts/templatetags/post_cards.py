@@ -0,0 +1,11 @@
+from django import template
+
+from ..caching import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts) -> list:
+    """Готовый HTML карточек страницы, взятый из кэша одним запросом."""
+    return render_cards(posts)
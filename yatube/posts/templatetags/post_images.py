@@ -0,0 +1,11 @@
+from django import template
+
+from ..variants import srcsets as variant_srcsets
+
+register = template.Library()
+
+
+@register.filter
+def srcsets(image) -> list:
+    """Пары (MIME-тип, srcset) вариантов, найденных thumbnails.prefetch()."""
+    return variant_srcsets(getattr(image, 'variants', ()))
@@ -0,0 +1,246 @@
+from datetime import datetime
+from unittest import mock
+
+from django.db import connection
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.query_budget import query_budget
+from .. import admin
+from ..caching import POST, generations
+from ..models import AuthorStats, Comment, FeedEntry, Follow, Group, Post, User
+from ..pagination import EstimatedCountPaginator
+
+
+class PostAdminTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        cls.groups = [
+            Group.objects.create(
+                title=f'Глава {number}',
+                slug=f'chapter-{number}',
+                description='Глава романа',
+            )
+            for number in range(5)
+        ]
+        dates = (
+            (2020, 12, 31), (2021, 1, 1), (2021, 1, 15), (2021, 3, 8),
+            (2023, 7, 1),
+        )
+        for number, (year, month, day) in enumerate(dates * 6):
+            post = Post.objects.create(
+                author=cls.admin,
+                group=cls.groups[number % 5],
+                text=f'Запись {number}',
+            )
+            moment = datetime(year, month, day, number % 24)
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=timezone.make_aware(moment)
+            )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(PostAdminTest.admin)
+
+    def test_changelist_queries(self):
+        """Список постов не читает группы и авторов по строкам."""
+        url = reverse('admin:posts_post_changelist')
+        self.client.get(url)
+        with query_budget(13):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['cl'].result_list), 30)
+        post = Post.objects.first()
+        self.assertContains(
+            response,
+            f'<option value="{post.group_id}" selected>{post.group}</option>',
+            html=True,
+        )
+        self.assertNotContains(response, '&lt;option')
+
+    def test_pub_dates_match_queryset_dates(self):
+        """pub_dates() совпадает с dates() для годов, месяцев и дней."""
+        posts = Post.objects.all()
+        for kind in ('year', 'month', 'day'):
+            for order in ('ASC', 'DESC'):
+                with self.subTest(kind=kind, order=order):
+                    self.assertEqual(
+                        posts.pub_dates(kind, order),
+                        list(posts.dates('pub_date', kind, order)),
+                    )
+        january = posts.filter(pub_date__year=2021, pub_date__month=1)
+        self.assertEqual(
+            [day.day for day in january.pub_dates('day')], [1, 15]
+        )
+        self.assertEqual(posts.none().pub_dates('year'), [])
+
+    def test_dates_untouched_outside_admin(self):
+        """Вне админки dates() постов остаётся обычным QuerySet."""
+        self.assertIsInstance(
+            Post.objects.dates('pub_date', 'year'), QuerySet
+        )
+        changelist = self.client.get(
+            reverse('admin:posts_post_changelist')
+        ).context['cl']
+        self.assertIsInstance(
+            changelist.queryset, admin.DateHierarchyQuerySet
+        )
+
+    def test_date_hierarchy(self):
+        """Навигация по датам показывает только годы с постами."""
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertContains(response, '?pub_date__year=2021')
+        self.assertNotContains(response, '?pub_date__year=2022')
+
+    def test_estimated_count(self):
+        """Без фильтров число строк оценивается, с фильтром — считается."""
+        posts = Post.objects.all()
+        self.assertEqual(EstimatedCountPaginator(posts, 10).count, 30)
+        filtered = posts.filter(group=PostAdminTest.groups[0])
+        self.assertEqual(EstimatedCountPaginator(filtered, 10).count, 6)
+
+
+class CommentFollowAdminTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        cls.author = User.objects.create_user(username='Гоголь')
+        cls.post = Post.objects.create(author=cls.author, text='Шинель')
+        cls.readers = [
+            User.objects.create_user(username=f'Читатель{number}')
+            for number in range(10)
+        ]
+        for reader in cls.readers:
+            Comment.objects.create(
+                post=cls.post, author=reader, text='Прочёл'
+            )
+            Follow.objects.create(user=reader, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(CommentFollowAdminTest.admin)
+
+    def act(self, model, action, objects):
+        return self.client.post(
+            reverse(f'admin:posts_{model}_changelist'),
+            {
+                'action': action,
+                '_selected_action': [obj.pk for obj in objects],
+            },
+        )
+
+    def test_forms_use_autocomplete(self):
+        """Формы не выводят всех пользователей и все посты списком."""
+        for model in ('comment', 'follow'):
+            with self.subTest(model=model):
+                response = self.client.get(reverse(f'admin:posts_{model}_add'))
+                self.assertContains(response, 'admin-autocomplete')
+                self.assertNotContains(response, 'Читатель0')
+
+    def test_changelists(self):
+        """Списки не читают связанные объекты по строкам."""
+        for model in ('comment', 'follow'):
+            url = reverse(f'admin:posts_{model}_changelist')
+            with self.subTest(model=model), query_budget(5):
+                response = self.client.get(url)
+            self.assertEqual(response.context['cl'].result_count, 10)
+
+    def test_delete_comments(self):
+        """Комментарии удаляются одним DELETE, счётчики пересчитываются."""
+        readers = CommentFollowAdminTest.readers
+        with CaptureQueriesContext(connection) as queries:
+            self.act('comment', 'delete_rows', Comment.objects.all())
+        deletes = [
+            query for query in queries
+            if query['sql'].startswith('DELETE FROM "posts_comment"')
+        ]
+        self.assertEqual(len(deletes), 1)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(
+            AuthorStats.objects.get(user=readers[0]).comments_count, 0
+        )
+
+    def test_bulk_delete_skips_signals(self):
+        """delete_rows не шлёт сигналы, а поколения страниц сдвигает сам."""
+        post_scope = POST.format(post_id=CommentFollowAdminTest.post.pk)
+        before = generations([post_scope])
+        receiver = mock.Mock()
+        post_delete.connect(receiver, sender=Comment)
+        self.addCleanup(post_delete.disconnect, receiver, sender=Comment)
+        self.act('comment', 'delete_rows', Comment.objects.all())
+        receiver.assert_not_called()
+        self.assertFalse(Comment.objects.exists())
+        self.assertNotEqual(generations([post_scope]), before)
+
+    def test_delete_selected_kept(self):
+        """Обычное удаление доступно и проходит через сигналы."""
+        readers = CommentFollowAdminTest.readers
+        for model, objects in (
+            ('comment', Comment.objects.filter(author=readers[0])),
+            ('follow', Follow.objects.filter(user=readers[0])),
+        ):
+            with self.subTest(model=model):
+                response = self.client.get(
+                    reverse(f'admin:posts_{model}_changelist')
+                )
+                self.assertIn(
+                    'delete_selected',
+                    dict(response.context['action_form'].fields[
+                        'action'
+                    ].choices),
+                )
+                self.client.post(
+                    reverse(f'admin:posts_{model}_changelist'),
+                    {
+                        'action': 'delete_selected',
+                        '_selected_action': list(
+                            objects.values_list('pk', flat=True)
+                        ),
+                        'post': 'yes',
+                    },
+                )
+                self.assertFalse(objects.exists())
+        stats = AuthorStats.objects.get(user=readers[0])
+        self.assertEqual(
+            (stats.comments_count, stats.following_count), (0, 0)
+        )
+        self.assertFalse(FeedEntry.objects.filter(user=readers[0]).exists())
+
+    def test_hide_comments(self):
+        """Текст комментариев скрывается одним UPDATE."""
+        comments = Comment.objects.all()[:3]
+        with query_budget(6):
+            self.act('comment', 'hide_text', comments)
+        self.assertEqual(
+            Comment.objects.filter(text=admin.HIDDEN_TEXT).count(), 3
+        )
+
+    def test_delete_follows(self):
+        """После удаления подписок ленты и счётчики согласованы."""
+        readers = CommentFollowAdminTest.readers
+        self.act(
+            'follow', 'delete_rows',
+            Follow.objects.filter(user__in=readers[:5])
+        )
+        self.assertEqual(Follow.objects.count(), 5)
+        self.assertFalse(
+            FeedEntry.objects.filter(user__in=readers[:5]).exists()
+        )
+        self.assertEqual(
+            FeedEntry.objects.filter(user__in=readers[5:]).count(), 5
+        )
+        stats = AuthorStats.objects.get(user=CommentFollowAdminTest.author)
+        self.assertEqual(stats.followers_count, 5)
+        self.assertEqual(
+            AuthorStats.objects.get(user=readers[0]).following_count, 0
+        )
@@ -0,0 +1,189 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Group, Post, User
+
+
+@override_settings(POSTS_PER_PAGE=2)
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Незнайка')
+        cls.reader = User.objects.create_user(username='Знайка')
+        cls.group = Group.objects.create(
+            title='Цветочный город',
+            slug='flowers',
+            description='Новости Цветочного города',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}'
+            )
+            for number in range(5)
+        ]
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(3):
+            cls.posts[0].comments.create(
+                author=cls.reader, text=f'Комментарий {number}'
+            )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def walk(self, url) -> list:
+        """Все страницы ленты по ссылкам next."""
+        results = []
+        while url:
+            data = self.client.get(url).json()
+            results.extend(data['results'])
+            url = data['next']
+        return results
+
+    def test_pages_follow_cursor(self):
+        """Ссылки next и previous обходят ленту без пропусков и повторов."""
+        expected = [post.pk for post in reversed(ApiTest.posts)]
+        feeds = (
+            reverse('api:index'),
+            reverse('api:group_posts', kwargs={'slug': 'flowers'}),
+            reverse('api:profile_posts', kwargs={'username': 'Незнайка'}),
+        )
+        for url in feeds:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    [post['id'] for post in self.walk(url)], expected
+                )
+        second = self.client.get(
+            self.client.get(reverse('api:index')).json()['next']
+        ).json()
+        first = self.client.get(second['previous']).json()
+        self.assertEqual(
+            [post['id'] for post in first['results']], expected[:2]
+        )
+        self.assertIsNone(first['previous'])
+
+    def test_post_fields(self):
+        """Пост сериализуется из values() с автором и группой."""
+        post = ApiTest.posts[0]
+        data = self.client.get(
+            reverse('api:post_detail', kwargs={'post_id': post.pk})
+        ).json()
+        self.assertEqual(data, {
+            'id': post.pk,
+            'text': 'Пост 0',
+            'pub_date': data['pub_date'],
+            'author': 'Незнайка',
+            'group': 'flowers',
+            'image': None,
+        })
+
+    def test_sparse_fields(self):
+        """?fields= оставляет только перечисленные поля."""
+        response = self.client.get(
+            reverse('api:index'), {'fields': 'id,author'}
+        )
+        for post in response.json()['results']:
+            self.assertEqual(set(post), {'id', 'author'})
+        self.assertIn('fields=id%2Cauthor', response.json()['next'])
+        response = self.client.get(reverse('api:index'), {'fields': 'id,x'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('x', response.json()['detail'])
+        for fields in (',,', ''):
+            with self.subTest(fields=fields):
+                response = self.client.get(
+                    reverse('api:index'), {'fields': fields}
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('Доступны', response.content.decode())
+
+    def test_post_refreshes_on_rename(self):
+        """Новое имя автора и адрес группы сразу видны в посте, старый
+        ETag больше не даёт 304."""
+        url = reverse(
+            'api:post_detail', kwargs={'post_id': ApiTest.posts[0].pk}
+        )
+        author = User.objects.get(pk=ApiTest.author.pk)
+        group = Group.objects.get(pk=ApiTest.group.pk)
+        changes = (
+            (author, 'username', 'Пончик', 'author'),
+            (group, 'slug', 'sunny', 'group'),
+        )
+        for instance, attribute, value, field in changes:
+            with self.subTest(field=field):
+                etag = self.client.get(url)['ETag']
+                self.assertEqual(
+                    self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+                    304,
+                )
+                setattr(instance, attribute, value)
+                instance.save()
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()[field], value)
+
+    def test_comments(self):
+        """Комментарии поста идут от новых к старым."""
+        url = reverse(
+            'api:comments', kwargs={'post_id': ApiTest.posts[0].pk}
+        )
+        self.assertEqual(
+            [comment['text'] for comment in self.walk(url)],
+            ['Комментарий 2', 'Комментарий 1', 'Комментарий 0'],
+        )
+
+    def test_follow_feed(self):
+        """Лента подписок — только для вошедших, на любом движке."""
+        url = reverse('api:follow_posts')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_login(ApiTest.reader)
+        expected = [post.pk for post in reversed(ApiTest.posts)]
+        for engine in ('timeline', 'join', 'merge'):
+            with self.subTest(engine=engine):
+                with self.settings(FOLLOW_FEED_ENGINE=engine):
+                    cache.clear()
+                    self.assertEqual(
+                        [post['id'] for post in self.walk(url)], expected
+                    )
+
+    def test_not_found(self):
+        for url in (
+            reverse('api:post_detail', kwargs={'post_id': 0}),
+            reverse('api:comments', kwargs={'post_id': 0}),
+            reverse('api:group_posts', kwargs={'slug': 'nowhere'}),
+            reverse('api:profile_posts', kwargs={'username': 'Пончик'}),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('detail', response.json())
+
+    def test_queries(self):
+        """Страница ленты — один запрос, повтор — из кэша, с ETag — 304."""
+        url = reverse('api:index')
+        params = {'fields': 'id,author,group'}
+        with self.assertNumQueries(1):
+            response = self.client.get(url, params)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.client.get(url, params).json(), response.json()
+            )
+            response = self.client.get(
+                url, params, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_post_changes_etag(self):
+        url = reverse('api:group_posts', kwargs={'slug': 'flowers'})
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(
+            author=ApiTest.author, group=ApiTest.group, text='Свежий пост'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['text'], 'Свежий пост')
+
+    def test_read_only(self):
+        response = self.client.post(reverse('api:index'))
+        self.assertEqual(response.status_code, 405)
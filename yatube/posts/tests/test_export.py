@@ -0,0 +1,150 @@
+import csv
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import export
+from ..models import Comment, Group, Post, User
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Гоголь')
+        cls.other = User.objects.create_user(username='Пушкин')
+        cls.staff = User.objects.create_user(
+            username='Редактор', is_staff=True
+        )
+        cls.group = Group.objects.create(
+            title='Петербургские повести',
+            slug='petersburg',
+            description='Повести',
+        )
+        cls.old = Post.objects.create(
+            author=cls.author, text='Старая, "шинель"\nв две строки'
+        )
+        cls.nose = Post.objects.create(
+            author=cls.author, group=cls.group, text='Нос'
+        )
+        cls.poem = Post.objects.create(author=cls.other, text='Медный всадник')
+        Post.objects.filter(pk=cls.old.pk).update(
+            pub_date=timezone.now() - timedelta(days=30)
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.nose, author=cls.other, text='Где же нос?'
+        )
+
+    def command(self, *args) -> str:
+        output = StringIO()
+        call_command('export_posts', *args, stdout=output)
+        return output.getvalue()
+
+    def ids(self, *args) -> list:
+        return [
+            json.loads(line)['id']
+            for line in self.command(*args).splitlines()
+        ]
+
+    def test_ndjson(self):
+        """Каждая строка — пост с автором и группой, по возрастанию id."""
+        lines = self.command().splitlines()
+        self.assertEqual(
+            [json.loads(line)['id'] for line in lines],
+            [ExportTest.old.pk, ExportTest.nose.pk, ExportTest.poem.pk],
+        )
+        nose = json.loads(lines[1])
+        self.assertEqual(nose['author'], 'Гоголь')
+        self.assertEqual(nose['group'], 'petersburg')
+        self.assertEqual(nose['text'], 'Нос')
+
+    def test_filters(self):
+        today = timezone.localdate().isoformat()
+        cases = {
+            ('--group=petersburg',): [ExportTest.nose.pk],
+            ('--author=Пушкин',): [ExportTest.poem.pk],
+            ('--since', today): [ExportTest.nose.pk, ExportTest.poem.pk],
+            ('--until', (timezone.localdate() - timedelta(days=1))
+             .isoformat()): [ExportTest.old.pk],
+            ('--author=Гоголь', '--since', today): [ExportTest.nose.pk],
+        }
+        for args, expected in cases.items():
+            with self.subTest(args=args):
+                self.assertEqual(self.ids(*args), expected)
+
+    def test_csv(self):
+        """CSV с заголовком, многострочный текст не ломает строки."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'posts.csv')
+            self.command('--format=csv', '--chunk-size=1', '--output', path)
+            with open(path, encoding='utf-8', newline='') as file:
+                rows = list(csv.DictReader(file))
+        self.assertEqual(
+            list(rows[0]), list(export.COLUMNS['posts'])
+        )
+        self.assertEqual(rows[0]['text'], ExportTest.old.text)
+        self.assertEqual(rows[1]['group'], 'petersburg')
+        self.assertEqual(len(rows), 3)
+
+    def test_comments(self):
+        line = self.command('--kind=comments', '--group=petersburg')
+        self.assertEqual(json.loads(line), {
+            'id': ExportTest.comment.pk,
+            'created': json.loads(line)['created'],
+            'post': ExportTest.nose.pk,
+            'author': 'Пушкин',
+            'group': 'petersburg',
+            'text': 'Где же нос?',
+        })
+
+    def test_invalid_options(self):
+        for args in (
+            ('--group=moscow',),
+            ('--since=вчера',),
+            ('--since=2024-02-01', '--until=2024-01-01'),
+        ):
+            with self.subTest(args=args):
+                with self.assertRaises(CommandError):
+                    self.command(*args)
+
+    def test_rows_use_iterator(self):
+        """Строки читаются курсором кусками, а не всем queryset сразу."""
+        with mock.patch(
+            'django.db.models.query.QuerySet.iterator',
+            autospec=True, return_value=iter(()),
+        ) as iterator:
+            list(export.rows('posts', chunk_size=7))
+        self.assertEqual(iterator.call_args[1], {'chunk_size': 7})
+
+    def test_buffered(self):
+        self.assertEqual(
+            list(export.buffered(['ab', 'cd', 'e'], size=3)), ['abcd', 'e']
+        )
+
+    def test_endpoint(self):
+        """Выгрузка по адресу отдаётся потоком и только персоналу."""
+        url = reverse('posts:export')
+        client = Client()
+        self.assertEqual(client.get(url).status_code, 302)
+        client.force_login(ExportTest.author)
+        self.assertEqual(client.get(url).status_code, 302)
+        client.force_login(ExportTest.staff)
+        response = client.get(url, {'format': 'csv', 'author': 'Пушкин'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment', response['Content-Disposition'])
+        rows = list(csv.reader(
+            b''.join(response.streaming_content).decode().splitlines()
+        ))
+        self.assertEqual(rows[1][0], str(ExportTest.poem.pk))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(client.get(url, {'format': 'xml'}).status_code, 400)
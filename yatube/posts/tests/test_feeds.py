@@ -0,0 +1,238 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from .. import feeds
+from ..models import FeedEntry, Follow, FollowRow, Post, User
+
+
+class TimelineFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.stranger = User.objects.create_user(username='stranger')
+        Post.objects.bulk_create(
+            Post(author=cls.author, text=f'Старый пост {number}')
+            for number in range(5)
+        )
+        Post.objects.create(author=cls.stranger, text='Чужой пост')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(TimelineFeedTest.reader)
+
+    def feed(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return [post.text for post in response.context['page_obj']]
+
+    def expected(self):
+        return list(
+            Post.objects.filter(
+                author__following__user=TimelineFeedTest.reader
+            ).values_list('text', flat=True)
+        )
+
+    def test_follow_backfills_timeline(self):
+        """Подписка заполняет ленту старыми постами автора."""
+        self.client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'author'})
+        )
+        self.assertEqual(
+            FeedEntry.objects.filter(user=TimelineFeedTest.reader).count(),
+            5
+        )
+        self.assertEqual(self.feed(), self.expected())
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленты подписчиков и только в них."""
+        Follow.objects.create(
+            user=TimelineFeedTest.reader,
+            author=TimelineFeedTest.author
+        )
+        post = Post.objects.create(
+            author=TimelineFeedTest.author,
+            text='Свежий пост'
+        )
+        self.assertEqual(self.feed()[0], post.text)
+        self.assertEqual(
+            list(post.feed_entries.values_list('user', flat=True)),
+            [TimelineFeedTest.reader.id]
+        )
+
+    def test_unfollow_cleans_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(
+            user=TimelineFeedTest.reader,
+            author=TimelineFeedTest.author
+        )
+        Follow.objects.create(
+            user=TimelineFeedTest.reader,
+            author=TimelineFeedTest.stranger
+        )
+        self.client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'author'})
+        )
+        self.assertEqual(self.feed(), ['Чужой пост'])
+
+    @override_settings(FOLLOW_FEED_LENGTH=3)
+    def test_timeline_is_trimmed(self):
+        """Лента обрезается до FOLLOW_FEED_LENGTH последних постов."""
+        Follow.objects.create(
+            user=TimelineFeedTest.reader,
+            author=TimelineFeedTest.author
+        )
+        Post.objects.create(author=TimelineFeedTest.author, text='Новый')
+        Post.objects.create(author=TimelineFeedTest.author, text='Новейший')
+        entries = FeedEntry.objects.filter(user=TimelineFeedTest.reader)
+        self.assertEqual(entries.count(), 5)
+        call_command('trim_feeds', stdout=StringIO())
+        self.assertEqual(entries.count(), 3)
+        self.assertEqual(self.feed(), self.expected()[:3])
+
+    @override_settings(FOLLOW_FEED_LENGTH=3)
+    def test_unfollow_refills_trimmed_timeline(self):
+        """Отписка возвращает в обрезанную ленту старые посты подписок."""
+        Follow.objects.create(
+            user=TimelineFeedTest.reader,
+            author=TimelineFeedTest.stranger
+        )
+        Follow.objects.create(
+            user=TimelineFeedTest.reader,
+            author=TimelineFeedTest.author
+        )
+        Post.objects.bulk_create(
+            Post(author=TimelineFeedTest.author, text=f'Новый пост {number}')
+            for number in range(3)
+        )
+        feeds.rebuild([TimelineFeedTest.reader.id])
+        self.assertNotIn('Чужой пост', self.feed())
+        self.client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'author'})
+        )
+        self.assertEqual(self.feed(), ['Чужой пост'])
+
+    @override_settings(FOLLOW_FEED_LENGTH=3)
+    def test_prune_refills_trimmed_timeline(self):
+        """Чистка лент после массовой отписки тоже дополняет полные ленты."""
+        reader = TimelineFeedTest.reader
+        for author in (TimelineFeedTest.stranger, TimelineFeedTest.author):
+            Follow.objects.create(user=reader, author=author)
+        Post.objects.bulk_create(
+            Post(author=TimelineFeedTest.author, text=f'Новый пост {number}')
+            for number in range(3)
+        )
+        feeds.rebuild([reader.id])
+        FollowRow.objects.filter(author=TimelineFeedTest.author).delete()
+        feeds.prune([reader.id])
+        self.assertEqual(self.feed(), ['Чужой пост'])
+
+    @override_settings(POSTS_PAGINATION='cursor')
+    def test_timeline_cursor_pages(self):
+        """Курсорная пагинация работает поверх материализованной ленты."""
+        Follow.objects.create(
+            user=TimelineFeedTest.reader,
+            author=TimelineFeedTest.author
+        )
+        with self.settings(POSTS_PER_PAGE=2):
+            first = self.client.get(reverse('posts:follow_index'))
+            second = self.client.get(
+                reverse('posts:follow_index'),
+                {'after': first.context['page_obj'].next_cursor}
+            )
+        texts = [
+            post.text
+            for response in (first, second)
+            for post in response.context['page_obj']
+        ]
+        self.assertEqual(texts, self.expected()[:4])
+
+    @override_settings(FOLLOW_FEED_ENGINE='join')
+    def test_join_engine(self):
+        """Запасной движок строит ту же ленту запросом через Follow."""
+        Follow.objects.create(
+            user=TimelineFeedTest.reader,
+            author=TimelineFeedTest.author
+        )
+        self.assertEqual(self.feed(), self.expected())
+
+
+@override_settings(
+    FOLLOW_FEED_ENGINE='merge',
+    FOLLOW_FEED_RECENT=3,
+    POSTS_PER_PAGE=4,
+)
+class MergedFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{number}')
+            for number in range(3)
+        ]
+        Post.objects.bulk_create(
+            Post(author=author, text=f'{author.username}: {number}')
+            for number in range(5)
+            for author in cls.authors
+        )
+        Follow.objects.bulk_create(
+            Follow(user=cls.reader, author=author)
+            for author in cls.authors[:2]
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(MergedFeedTest.reader)
+        cache.clear()
+
+    def expected(self):
+        return list(
+            Post.objects.filter(
+                author__following__user=MergedFeedTest.reader
+            ).values_list('text', flat=True)
+        )
+
+    def page(self, **params):
+        page_obj = self.client.get(
+            reverse('posts:follow_index'), params
+        ).context['page_obj']
+        return page_obj, [post.text for post in page_obj]
+
+    def test_offset_pages_match_join(self):
+        """Слияние, в том числе обрезанных списков, совпадает с join."""
+        for recent in (3, 100):
+            with self.subTest(recent=recent), self.settings(
+                FOLLOW_FEED_RECENT=recent
+            ):
+                cache.clear()
+                texts = []
+                for number in (1, 2, 3):
+                    texts += self.page(page=number)[1]
+                self.assertEqual(texts, self.expected())
+
+    @override_settings(POSTS_PAGINATION='cursor')
+    def test_cursor_pages_match_join(self):
+        """Курсоры проходят слитую ленту вперёд и назад."""
+        pages = [self.page()]
+        while pages[-1][0].has_next():
+            pages.append(self.page(after=pages[-1][0].next_cursor))
+        self.assertEqual(
+            [text for _, texts in pages for text in texts],
+            self.expected()
+        )
+        back = self.page(before=pages[-1][0].previous_cursor)
+        self.assertEqual(back[1], pages[-2][1])
+
+    def test_new_post_invalidates_author_list(self):
+        """Новый пост сбрасывает кэш списка автора."""
+        self.page()
+        post = Post.objects.create(
+            author=MergedFeedTest.authors[0],
+            text='Только что'
+        )
+        self.assertEqual(self.page()[1][0], post.text)
@@ -7,7 +7,7 @@ from django.urls import reverse
 from django.test import Client, TestCase, override_settings
 
 from ..forms import PostForm
-from ..models import Post, Group, User
+from ..models import Post, Group, User, post_images
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -69,6 +69,7 @@ class PostCreateFormTest(TestCase):
             content=temp_gif,
             content_type='image/gif'
         )
+        image_name = post_images.hashed_name('posts/temp_2.gif', uploaded)
         form_data = {
             'text': 'Крекс, фекс, пекс',
             'group': PostCreateFormTest.group.id,
@@ -93,7 +94,7 @@ class PostCreateFormTest(TestCase):
             last_post.author.username: 'Буратино',
             last_post.text: 'Крекс, фекс, пекс',
             last_post.group.id: PostCreateFormTest.group.id,
-            last_post.image: 'posts/temp_2.gif',
+            last_post.image: image_name,
             Post.objects.count(): posts_count + 1,
         }
         for expected, value in context.items():
@@ -116,6 +117,7 @@ class PostCreateFormTest(TestCase):
             content=temp_gif,
             content_type='image/gif'
         )
+        image_name = post_images.hashed_name('posts/temp.gif', uploaded)
         form_data = {
             'text': 'В стране дураков',
             'group': PostCreateFormTest.group.id,
@@ -135,7 +137,7 @@ class PostCreateFormTest(TestCase):
             db_post.author.username: 'Буратино',
             db_post.text: 'В стране дураков',
             db_post.group.id: PostCreateFormTest.group.id,
-            db_post.image: 'posts/temp.gif',
+            db_post.image: image_name,
         }
         self.assertRedirects(
             response,
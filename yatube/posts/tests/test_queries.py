@@ -0,0 +1,195 @@
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from core.query_budget import query_budget
+from ..models import Comment, Follow, Group, Post, User
+
+
+class QueryBudgetTest(TestCase):
+    """Число запросов страницы не зависит от числа постов и комментариев."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Чичиков')
+        cls.reader = User.objects.create_user(username='Манилов')
+        cls.group = Group.objects.create(
+            title='Мёртвые души',
+            slug='souls',
+            description='Поэма',
+        )
+        for number in range(15):
+            author = User.objects.create_user(username=f'Помещик{number}')
+            Post.objects.create(
+                author=author,
+                group=cls.group,
+                text=f'Ревизская сказка {number}',
+            )
+            Follow.objects.create(user=cls.reader, author=author)
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='Покупаю души',
+        )
+        for author in User.objects.exclude(pk=cls.user.pk)[:10]:
+            Comment.objects.create(
+                post=cls.post,
+                author=author,
+                text=f'Продаю, {author.username}',
+            )
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(QueryBudgetTest.user)
+        self.reader_client = Client()
+        self.reader_client.force_login(QueryBudgetTest.reader)
+        cache.clear()
+
+    def test_guest_pages(self):
+        """Страницы для гостя укладываются в бюджет запросов."""
+        budgets = {
+            reverse('posts:index'): 2,
+            reverse(
+                'posts:group_list',
+                kwargs={'slug': QueryBudgetTest.group.slug}
+            ): 3,
+            reverse(
+                'posts:profile',
+                kwargs={'username': QueryBudgetTest.user.username}
+            ): 4,
+            reverse(
+                'posts:post_detail',
+                kwargs={'post_id': QueryBudgetTest.post.id}
+            ): 3,
+            reverse('posts:search') + '?q=сказка': 2,
+            reverse('about:author'): 0,
+            reverse('about:tech'): 0,
+            reverse('users:signup'): 0,
+            reverse('users:login'): 0,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url), query_budget(budget):
+                self.guest_client.get(url)
+
+    def test_authorized_pages(self):
+        """Страницы для пользователя укладываются в бюджет запросов."""
+        budgets = {
+            reverse('posts:index'): 4,
+            reverse(
+                'posts:group_list',
+                kwargs={'slug': QueryBudgetTest.group.slug}
+            ): 5,
+            reverse(
+                'posts:profile',
+                kwargs={'username': QueryBudgetTest.user.username}
+            ): 7,
+            reverse(
+                'posts:post_detail',
+                kwargs={'post_id': QueryBudgetTest.post.id}
+            ): 5,
+            reverse('posts:post_create'): 5,
+            reverse(
+                'posts:post_edit',
+                kwargs={'post_id': QueryBudgetTest.post.id}
+            ): 4,
+            reverse('posts:follow_index'): 3,
+            reverse('users:password_change'): 2,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url), query_budget(budget):
+                self.authorized_client.get(url)
+
+    def test_index_body_is_shared(self):
+        """Пользователь получает ленту главной, собранную для гостя."""
+        self.guest_client.get(reverse('posts:index'))
+        with query_budget(2):
+            response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Пользователь: Чичиков')
+        self.assertContains(response, 'Покупаю души')
+
+    def test_api(self):
+        """Эндпоинты API укладываются в бюджет запросов."""
+        budgets = {
+            reverse('api:index'): 1,
+            reverse(
+                'api:post_detail',
+                kwargs={'post_id': QueryBudgetTest.post.id}
+            ): 2,
+            reverse(
+                'api:comments',
+                kwargs={'post_id': QueryBudgetTest.post.id}
+            ): 2,
+            reverse(
+                'api:group_posts',
+                kwargs={'slug': QueryBudgetTest.group.slug}
+            ): 2,
+            reverse(
+                'api:profile_posts',
+                kwargs={'username': QueryBudgetTest.user.username}
+            ): 2,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url), query_budget(budget):
+                self.guest_client.get(url)
+        with query_budget(3):
+            self.reader_client.get(reverse('api:follow_posts'))
+
+    def test_export(self):
+        """Выгрузка укладывается в бюджет запросов."""
+        staff = User.objects.create_user(username='Плюшкин', is_staff=True)
+        self.authorized_client.force_login(staff)
+        for kind in ('posts', 'comments'):
+            url = reverse('posts:export') + f'?kind={kind}'
+            with self.subTest(kind=kind), query_budget(3):
+                response = self.authorized_client.get(url)
+                b''.join(response.streaming_content)
+
+    @query_budget(4)
+    def test_follow_feed(self):
+        """Лента подписок на 15 авторов укладывается в бюджет запросов."""
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_writes(self):
+        """Запросы на запись укладываются в бюджет запросов."""
+        writes = (
+            (
+                reverse(
+                    'posts:add_comment',
+                    kwargs={'post_id': QueryBudgetTest.post.id}
+                ),
+                {'text': 'Ноздрёв'},
+                7,
+            ),
+            (reverse('posts:post_create'), {'text': 'Собакевич'}, 7),
+            (
+                reverse(
+                    'posts:profile_follow',
+                    kwargs={'username': 'Манилов'}
+                ),
+                None,
+                12,
+            ),
+            (
+                reverse(
+                    'posts:profile_unfollow',
+                    kwargs={'username': 'Манилов'}
+                ),
+                None,
+                13,
+            ),
+        )
+        for url, data, budget in writes:
+            with self.subTest(url=url), query_budget(budget):
+                if data is None:
+                    self.authorized_client.get(url)
+                else:
+                    self.authorized_client.post(url, data)
+
+    def test_budget_reports_queries(self):
+        """Превышение бюджета перечисляет выполненные запросы."""
+        with self.assertRaisesMessage(AssertionError, '1. SELECT'):
+            with query_budget(0):
+                list(Post.objects.all())
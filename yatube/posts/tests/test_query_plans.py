@@ -0,0 +1,81 @@
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..api import COMMENT_KEYS
+from ..feeds import follow_feed
+from ..models import Follow, Group, Post, User
+from ..pagination import KEYS, keyset
+
+
+def query_plan(queryset) -> list:
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class FeedQueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Кэрролл')
+        cls.reader = User.objects.create_user(username='Алиса')
+        cls.group = Group.objects.create(
+            title='Зазеркалье',
+            slug='looking-glass',
+            description='По ту сторону',
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.user, group=cls.group, text=f'Пост {number}')
+            for number in range(30)
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def test_feeds_use_indexes_for_ordering(self):
+        """Ни одной ленте не нужна временная сортировка."""
+        anchor = Post.objects.all()[15]
+        key = (anchor.pub_date, anchor.id)
+        timeline, keys = follow_feed(FeedQueryPlanTest.reader)
+        feeds = {
+            'index': (Post.objects.all(), KEYS),
+            'group': (FeedQueryPlanTest.group.posts.all(), KEYS),
+            'profile': (FeedQueryPlanTest.user.posts.all(), KEYS),
+            'follow': (timeline, keys),
+            'comments': (anchor.comments.all(), COMMENT_KEYS),
+        }
+        for name, (posts, keys) in feeds.items():
+            for reverse_order in (False, True):
+                for seek in (None, key):
+                    queryset = keyset(posts, seek, reverse_order, keys)
+                    with self.subTest(
+                        feed=name, seek=seek, reverse=reverse_order
+                    ):
+                        plan = query_plan(queryset[:11])
+                        self.assertFalse(
+                            [step for step in plan if 'TEMP B-TREE' in step],
+                            plan
+                        )
+
+    def test_follow_is_unique(self):
+        """Повторная подписка и подписка на себя отклоняются базой."""
+        for author in (FeedQueryPlanTest.user, FeedQueryPlanTest.reader):
+            with self.subTest(author=author):
+                with self.assertRaises(IntegrityError):
+                    with transaction.atomic():
+                        Follow.objects.create(
+                            user=FeedQueryPlanTest.reader,
+                            author=author
+                        )
+
+    def test_follow_view_is_idempotent(self):
+        """Повторный запрос подписки не создаёт дубль и не падает."""
+        client = Client()
+        client.force_login(FeedQueryPlanTest.reader)
+        url = reverse('posts:profile_follow', kwargs={'username': 'Кэрролл'})
+        for _ in range(2):
+            self.assertRedirects(
+                client.get(url),
+                reverse('posts:profile', kwargs={'username': 'Кэрролл'})
+            )
+        self.assertEqual(FeedQueryPlanTest.reader.follower.count(), 1)
@@ -0,0 +1,87 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from .. import search
+from ..models import Post, User
+from ..search import find_posts
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Пушкин')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        cls.onegin = Post.objects.create(
+            author=cls.user, text='Мой дядя самых честных правил'
+        )
+        cls.storm = Post.objects.create(
+            author=cls.user, text='Буря мглою небо кроет, буря воет'
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Буря номер {number}')
+            for number in range(12)
+        )
+
+    def texts(self, query):
+        return list(find_posts(query).values_list('text', flat=True))
+
+    def test_index_follows_writes(self):
+        """Индекс видит bulk_create, правку и удаление поста."""
+        self.assertEqual(len(self.texts('буря')), 13)
+        self.assertEqual(self.texts('ПРАВИЛ'), [SearchTest.onegin.text])
+        Post.objects.filter(pk=SearchTest.onegin.pk).update(
+            text='Когда не в шутку занемог'
+        )
+        self.assertEqual(self.texts('правил'), [])
+        self.assertEqual(len(self.texts('занемог')), 1)
+        Post.objects.filter(text__startswith='Буря номер').delete()
+        self.assertEqual(self.texts('буря'), [SearchTest.storm.text])
+
+    def test_ranking_and_syntax(self):
+        """Частое слово выше в выдаче, синтаксис FTS5 не ломает запрос."""
+        self.assertEqual(self.texts('буря')[0], SearchTest.storm.text)
+        self.assertEqual(self.texts('мглою буря'), [SearchTest.storm.text])
+        for query in ('"', 'буря OR', 'NEAR(', '*', ''):
+            with self.subTest(query=query):
+                self.assertLessEqual(len(self.texts(query)), 13)
+
+    def test_search_page(self):
+        """Страница поиска пагинирует выдачу и сохраняет запрос в ссылках."""
+        response = Client().get(reverse('posts:search'), {'q': 'буря'})
+        self.assertEqual(response.context['page_obj'].paginator.count, 13)
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertContains(response, '?q=%D0%B1%D1%83%D1%80%D1%8F&amp;page=2')
+        response = Client().get(
+            reverse('posts:search'), {'q': 'буря', 'page': 2}
+        )
+        self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_admin_uses_index(self):
+        """Поиск в админке идёт через полнотекстовый индекс."""
+        client = Client()
+        client.force_login(SearchTest.admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'мглою'}
+        )
+        self.assertEqual(response.context['cl'].result_count, 1)
+        sql = str(response.context['cl'].queryset.query)
+        self.assertIn(search.SEARCH_TABLE, sql)
+        self.assertNotIn('LIKE', sql)
+
+    def test_rebuild_restores_index(self):
+        """Команда rebuild_search восстанавливает потерянный индекс."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {search.SEARCH_TABLE}({search.SEARCH_TABLE}) "
+                f"VALUES ('delete-all')"
+            )
+        self.assertEqual(self.texts('буря'), [])
+        call_command('rebuild_search', stdout=StringIO())
+        self.assertEqual(len(self.texts('буря')), 13)
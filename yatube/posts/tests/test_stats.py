@@ -0,0 +1,124 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import AuthorStats, Comment, Follow, Post, User
+
+
+class AuthorStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Тургенев')
+        cls.reader = User.objects.create_user(username='Герасим')
+        cls.post = Post.objects.create(author=cls.author, text='Муму')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(AuthorStatsTest.reader)
+
+    def stats(self, user):
+        return AuthorStats.objects.values(
+            'posts_count',
+            'followers_count',
+            'following_count',
+            'comments_count',
+        ).get(user=user)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются вместе с постами, подписками и комментариями."""
+        self.client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'Тургенев'})
+        )
+        self.client.post(
+            reverse(
+                'posts:add_comment',
+                kwargs={'post_id': AuthorStatsTest.post.id}
+            ),
+            data={'text': 'Му-му'},
+        )
+        self.client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Записки охотника'},
+        )
+        self.assertEqual(self.stats(AuthorStatsTest.author), {
+            'posts_count': 1,
+            'followers_count': 1,
+            'following_count': 0,
+            'comments_count': 0,
+        })
+        self.assertEqual(self.stats(AuthorStatsTest.reader), {
+            'posts_count': 1,
+            'followers_count': 0,
+            'following_count': 1,
+            'comments_count': 1,
+        })
+        self.client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'Тургенев'})
+        )
+        Post.objects.filter(author=AuthorStatsTest.reader).delete()
+        self.assertEqual(self.stats(AuthorStatsTest.reader), {
+            'posts_count': 0,
+            'followers_count': 0,
+            'following_count': 0,
+            'comments_count': 1,
+        })
+
+    def test_cascade_delete_updates_counters(self):
+        """Удаление поста каскадом уменьшает счётчик комментариев."""
+        Comment.objects.create(
+            post=AuthorStatsTest.post,
+            author=AuthorStatsTest.reader,
+            text='Барыня',
+        )
+        Post.objects.get(pk=AuthorStatsTest.post.pk).delete()
+        self.assertEqual(
+            self.stats(AuthorStatsTest.reader)['comments_count'], 0
+        )
+        self.assertEqual(self.stats(AuthorStatsTest.author)['posts_count'], 0)
+
+    def test_recount_repairs_drift(self):
+        """Команда recount восстанавливает испорченные счётчики."""
+        Follow.objects.create(
+            user=AuthorStatsTest.reader,
+            author=AuthorStatsTest.author
+        )
+        expected = self.stats(AuthorStatsTest.author)
+        AuthorStats.objects.update(posts_count=42, followers_count=7)
+        AuthorStats.objects.filter(user=AuthorStatsTest.reader).delete()
+        call_command('recount', stdout=StringIO())
+        self.assertEqual(self.stats(AuthorStatsTest.author), expected)
+        self.assertEqual(
+            self.stats(AuthorStatsTest.reader)['following_count'], 1
+        )
+
+    @override_settings(POSTS_PAGINATION='cursor')
+    def test_pages_do_not_aggregate(self):
+        """Профиль и пост читают сохранённые счётчики без COUNT по постам."""
+        pages = (
+            reverse('posts:profile', kwargs={'username': 'Тургенев'}),
+            reverse(
+                'posts:post_detail',
+                kwargs={'post_id': AuthorStatsTest.post.id}
+            ),
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(page)
+                self.assertContains(response, 'Муму')
+                self.assertEqual(
+                    [
+                        query['sql'] for query in queries.captured_queries
+                        if 'COUNT(' in query['sql']
+                    ],
+                    []
+                )
+                self.assertEqual(
+                    response.context['posts_count'],
+                    self.stats(AuthorStatsTest.author)['posts_count']
+                )
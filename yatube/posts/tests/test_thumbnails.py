@@ -0,0 +1,212 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from itertools import count
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.template.loader import render_to_string
+from django.core.management import call_command
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..caching import INDEX, bump
+from ..models import Post, ThumbnailJob, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+# Картинки хранятся по содержимому: каждому посту нужна своя
+COLORS = count()
+
+
+def gif():
+    buffer = BytesIO()
+    Image.new('RGB', (2, 1), (next(COLORS), 0, 0)).save(buffer, 'GIF')
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Репин')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(ThumbnailTest.user)
+
+    def create_post(self):
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'Бурлаки на Волге',
+            'image': SimpleUploadedFile(
+                'volga.gif', gif(), content_type='image/gif'
+            ),
+        })
+        return Post.objects.filter(text='Бурлаки на Волге').first()
+
+    def card_thumbnail(self, post):
+        geometry, options = settings.POST_THUMBNAILS['card']
+        return thumbnails.backend.thumbnail_file(
+            post.image, geometry, **options
+        )
+
+    def test_request_does_not_resize(self):
+        """Запросы не создают миниатюр и отдают оригинал."""
+        post = self.create_post()
+        self.assertTrue(
+            cache.get(thumbnails.QUEUED_KEY.format(post.image.name))
+        )
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, post.image.url)
+        self.assertFalse(self.card_thumbnail(post).exists())
+        self.assertFalse(thumbnails.is_ready(post.image, 'card'))
+
+    def test_pregenerated_thumbnail_is_served(self):
+        """После фоновой генерации страницы показывают миниатюру."""
+        post = self.create_post()
+        self.client.get(reverse('posts:index'))
+        thumbnails.pregenerate(post.image.name)
+        self.assertTrue(thumbnails.is_ready(post.image, 'card'))
+        self.assertIsNone(
+            cache.get(thumbnails.QUEUED_KEY.format(post.image.name))
+        )
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, self.card_thumbnail(post).url)
+        self.assertNotContains(response, post.image.url)
+
+    def test_enqueue_once(self):
+        """Пока картинка в очереди, она не ставится туда повторно."""
+        with self.settings(THUMBNAIL_WORKERS=0):
+            thumbnails.enqueue('posts/none.gif')
+            self.assertFalse(cache.add(
+                thumbnails.QUEUED_KEY.format('posts/none.gif'), True
+            ))
+        self.assertEqual(
+            list(ThumbnailJob.objects.values_list('name', flat=True)),
+            ['posts/none.gif'],
+        )
+
+    def test_text_edit_not_enqueued(self):
+        """В очередь ставится новая картинка, но не правка текста."""
+        post = self.create_post()
+        thumbnails.drain()
+        with mock.patch.object(thumbnails, 'enqueue') as enqueue:
+            post.text = 'Запорожцы'
+            post.save()
+            enqueue.assert_not_called()
+            post.image = SimpleUploadedFile('sea.gif', gif())
+            post.save()
+        enqueue.assert_called_once_with(post.image.name)
+
+    def test_command_drains_queue(self):
+        """process_thumbnails создаёт миниатюры и снимает задачи."""
+        post = self.create_post()
+        self.assertTrue(
+            ThumbnailJob.objects.filter(name=post.image.name).exists()
+        )
+        call_command('process_thumbnails', stdout=StringIO())
+        self.assertTrue(thumbnails.is_ready(post.image, 'card'))
+        self.assertFalse(ThumbnailJob.objects.exists())
+
+    def test_page_prefetch(self):
+        """Миниатюры страницы ищутся одним запросом, тег их не ищет."""
+        posts = [self.create_post() for _ in range(4)]
+        for post in posts[:2]:
+            thumbnails.pregenerate(post.image.name)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        lookups = [
+            query for query in queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(lookups), 1)
+        for post in posts:
+            with self.subTest(post=post.pk):
+                self.assertContains(
+                    response,
+                    self.card_thumbnail(post).url if post in posts[:2]
+                    else post.image.url
+                )
+        bump(INDEX)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:index'))
+        self.assertNotIn(
+            'thumbnail_kvstore', ' '.join(query['sql'] for query in queries)
+        )
+
+    def test_tag_uses_prefetched(self):
+        """После prefetch() тег {% thumbnail %} не читает kvstore."""
+        post = self.create_post()
+        thumbnails.pregenerate(post.image.name)
+        post = Post.objects.for_feed().get(pk=post.pk)
+        thumbnails.prefetch([post])
+        with mock.patch.object(
+            thumbnails.BatchedKVStore, '_get_raw', side_effect=AssertionError
+        ):
+            html = render_to_string(
+                'posts/includes/article.html', {'post': post}
+            )
+        self.assertIn(self.card_thumbnail(post).url, html)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailCommitTest(TransactionTestCase):
+    """Коммиты настоящие: on_commit-обработчики выполняются."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='Шишкин')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_requests_do_no_image_work(self):
+        """Ни загрузка, ни показ картинки не создают миниатюр в запросе."""
+        with mock.patch.object(
+            thumbnails, 'pregenerate', side_effect=AssertionError
+        ), mock.patch.object(
+            thumbnails.variants, 'generate', side_effect=AssertionError
+        ):
+            self.client.post(reverse('posts:post_create'), {
+                'text': 'Утро в сосновом лесу',
+                'image': SimpleUploadedFile(
+                    'forest.gif', gif(), content_type='image/gif'
+                ),
+            })
+            post = Post.objects.get()
+            cache.clear()
+            ThumbnailJob.objects.all().delete()
+            for url in (
+                reverse('posts:index'),
+                reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+            ):
+                with self.subTest(url=url):
+                    self.assertContains(self.client.get(url), post.image.url)
+        self.assertFalse(thumbnails.is_ready(post.image, 'card'))
+        self.assertTrue(
+            ThumbnailJob.objects.filter(name=post.image.name).exists()
+        )
+        self.assertEqual(thumbnails.drain(), 1)
+        self.assertTrue(thumbnails.is_ready(post.image, 'card'))
@@ -0,0 +1,262 @@
+import os
+import shutil
+import struct
+import tempfile
+import time
+import zlib
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image, ImageFile
+
+from core.uploads import LimitedUploadHandler
+from .. import thumbnails
+from ..models import ImageVariant, Post, User, post_images
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def png_chunk(kind, data):
+    return (
+        struct.pack('>I', len(data)) + kind + data
+        + struct.pack('>I', zlib.crc32(kind + data))
+    )
+
+
+def png_header(width, height):
+    """PNG, который только заявляет размер: данных в нём почти нет."""
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + png_chunk(
+            b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+        )
+        + png_chunk(b'IDAT', zlib.compress(b'\x00' * 64))
+        + png_chunk(b'IEND', b'')
+    )
+
+
+def noise_png(size):
+    buffer = BytesIO()
+    Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3)).save(
+        buffer, 'PNG'
+    )
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class UploadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Левитан')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(UploadTest.user)
+
+    def create_post(self, name, content):
+        return self.client.post(reverse('posts:post_create'), {
+            'text': 'Над вечным покоем',
+            'image': SimpleUploadedFile(name, content),
+        })
+
+    @override_settings(FILE_UPLOAD_MAX_SIZE=1000)
+    def test_handler_writes_up_to_limit(self):
+        """На диск ложится не больше FILE_UPLOAD_MAX_SIZE байт."""
+        handler = LimitedUploadHandler()
+        handler.new_file('image', 'big.png', 'image/png', None)
+        for start in range(0, 3000, 512):
+            handler.receive_data_chunk(b'x' * 512, start)
+        uploaded = handler.file_complete(3072)
+        self.assertTrue(uploaded.truncated)
+        self.assertEqual(uploaded.size, 3072)
+        self.assertEqual(
+            os.path.getsize(uploaded.temporary_file_path()), 1000
+        )
+        uploaded.close()
+
+    @override_settings(FILE_UPLOAD_MAX_SIZE=64 * 1024)
+    def test_too_large_rejected(self):
+        """Слишком большой файл отклоняется с понятной ошибкой."""
+        response = self.create_post('noise.png', noise_png((512, 512)))
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 64,0\xa0КБ.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(FILE_UPLOAD_MAX_SIZE=64 * 1024)
+    def test_limit_only_on_post_forms(self):
+        """Лимит действует в формах поста, но не в админке."""
+        admin = User.objects.create_superuser(
+            username='Шишкин', email='shishkin@example.com', password='x'
+        )
+        self.client.force_login(admin)
+        response = self.client.post(reverse('admin:posts_post_add'), {
+            'text': 'Утро в сосновом лесу',
+            'author': admin.pk,
+            'image': SimpleUploadedFile('noise.png', noise_png((512, 512))),
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Post.objects.get().image)
+
+    def test_post_forms_check_csrf(self):
+        """Замена обработчиков загрузки не отключает проверку CSRF."""
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(UploadTest.user)
+        response = client.post(
+            reverse('posts:post_create'), {'text': 'Над вечным покоем'}
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Post.objects.exists())
+
+    def test_too_many_pixels_rejected_without_decoding(self):
+        """Размер в пикселях проверяется по заголовку, без декодирования."""
+        with mock.patch.object(
+            ImageFile.ImageFile, 'load', side_effect=AssertionError
+        ):
+            response = self.create_post(
+                'bomb.png', png_header(20000, 20000)
+            )
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка больше 25 мегапикселей.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    def test_exif_stripped(self):
+        """EXIF удаляется, поворот из него переносится в пиксели."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Фотоаппарат'
+        buffer = BytesIO()
+        Image.new('RGB', (40, 20), 'green').save(
+            buffer, 'JPEG', exif=exif.tobytes()
+        )
+        self.create_post('photo.jpg', buffer.getvalue())
+        post = Post.objects.get()
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (20, 40))
+            self.assertNotIn('exif', image.info)
+        self.assertEqual(post.image.size, os.path.getsize(post.image.path))
+
+    def test_icc_profile_kept(self):
+        """Перекодирование без EXIF не теряет цветовой профиль."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        # содержимое профиля Pillow не разбирает, только переносит
+        profile = b'icc-profile' * 100
+        buffer = BytesIO()
+        Image.new('RGB', (40, 20), 'green').save(
+            buffer, 'JPEG', exif=exif.tobytes(), icc_profile=profile
+        )
+        self.create_post('photo.jpg', buffer.getvalue())
+        with Image.open(Post.objects.get().image.path) as image:
+            self.assertNotIn('exif', image.info)
+            self.assertEqual(image.info.get('icc_profile'), profile)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedMediaTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Саврасов')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_post(self, content):
+        return Post.objects.create(
+            author=ContentAddressedMediaTest.user,
+            text='Грачи прилетели',
+            image=SimpleUploadedFile('rooks.png', content),
+        )
+
+    def test_same_image_stored_once(self):
+        """Одинаковые картинки хранятся одним файлом с общими миниатюрами."""
+        content = noise_png((64, 64))
+        first = self.create_post(content)
+        thumbnails.pregenerate(first.image.name)
+        second = self.create_post(content)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(
+            first.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.png$'
+        )
+        self.assertEqual(
+            os.listdir(os.path.dirname(first.image.path)),
+            [os.path.basename(first.image.name)],
+        )
+        self.assertTrue(thumbnails.is_ready(second.image, 'card'))
+        self.assertNotEqual(
+            self.create_post(noise_png((64, 64))).image.name,
+            first.image.name,
+        )
+
+    def test_sweep(self):
+        """Очистка удаляет только картинки без постов, с миниатюрами."""
+        kept = self.create_post(noise_png((32, 32)))
+        removed = self.create_post(noise_png((32, 32)))
+        for post in (kept, removed):
+            thumbnails.pregenerate(post.image.name)
+        name = removed.image.name
+        path = removed.image.path
+        geometry, options = settings.POST_THUMBNAILS['card']
+        thumbnail = thumbnails.backend.thumbnail_file(
+            removed.image, geometry, **options
+        )
+        self.assertTrue(thumbnail.exists())
+        removed.delete()
+        self.assertNotIn(name, thumbnails.sweep(60 * 60, dry_run=True))
+        output = StringIO()
+        call_command('sweep_media', '--min-age=0', '--dry-run', stdout=output)
+        self.assertIn(name, output.getvalue())
+        self.assertTrue(os.path.exists(path))
+        self.assertIn(name, thumbnails.sweep(0))
+        self.assertFalse(post_images.exists(name))
+        self.assertFalse(thumbnail.exists())
+        self.assertFalse(ImageVariant.objects.filter(source=name).exists())
+        self.assertTrue(post_images.exists(kept.image.name))
+        self.assertTrue(ImageVariant.objects.filter(
+            source=kept.image.name
+        ).exists())
+
+    def test_reupload_protects_from_sweep(self):
+        """Повторная загрузка старой брошенной картинки не даёт её удалить."""
+        content = noise_png((16, 16))
+        first = self.create_post(content)
+        name, path = first.image.name, first.image.path
+        first.delete()
+        long_ago = time.time() - 2 * 60 * 60
+        os.utime(path, (long_ago, long_ago))
+        self.assertIn(name, thumbnails.sweep(60 * 60, dry_run=True))
+        second = self.create_post(content)
+        self.assertEqual(second.image.name, name)
+        self.assertNotIn(name, thumbnails.sweep(60 * 60))
+        self.assertTrue(post_images.exists(name))
+
+    def test_sweep_rechecks_before_delete(self):
+        """Картинка, на которую сослались после обхода, не удаляется."""
+        post = self.create_post(noise_png((16, 16)))
+        long_ago = time.time() - 2 * 60 * 60
+        os.utime(post.image.path, (long_ago, long_ago))
+        deadline = timezone.now()
+        self.assertFalse(thumbnails.still_unused(post.image.name, deadline))
+        Post.objects.filter(pk=post.pk).update(image='')
+        self.assertTrue(thumbnails.still_unused(post.image.name, deadline))
@@ -0,0 +1,101 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails, variants
+from ..models import ImageVariant, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def png(size, mode='RGB'):
+    buffer = BytesIO()
+    Image.new(mode, size, 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageVariantTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Шишкин')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Утро в сосновом лесу',
+            image=SimpleUploadedFile('forest.png', png((2880, 1017))),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_sizes(self):
+        """Варианты вписываются в рамки и не увеличивают картинку."""
+        self.assertEqual(
+            variants.sizes(2880, 1017),
+            [(480, 170), (960, 339), (1440, 508)],
+        )
+        self.assertEqual(variants.sizes(600, 100), [(480, 80), (600, 100)])
+        self.assertEqual(variants.sizes(100, 100), [(100, 100)])
+
+    @override_settings(POST_IMAGE_FORMATS=('AVIF', 'JPEG', 'PNG'))
+    def test_generated_once(self):
+        """Варианты создаются один раз и только в доступных форматах."""
+        name = ImageVariantTest.post.image.name
+        created = variants.generate(name)
+        self.assertEqual(variants.generate(name), [])
+        expected = {
+            (image_format, width)
+            for image_format in variants.formats()
+            for width in (480, 960, 1440)
+        }
+        self.assertEqual(
+            set(ImageVariant.objects.filter(source=name).values_list(
+                'format', 'width'
+            )),
+            expected,
+        )
+        self.assertEqual(len(created), len(expected))
+        self.assertEqual(variants.formats()[-2:], ['JPEG', 'PNG'])
+        small = ImageVariant.objects.get(source=name, format='JPEG', width=480)
+        self.assertLess(small.size, ImageVariant.objects.get(
+            source=name, format='JPEG', width=1440
+        ).size)
+        with Image.open(small.file.path) as image:
+            self.assertEqual(image.size, (480, 170))
+
+    def test_transparent_jpeg(self):
+        """Прозрачность в JPEG заменяется белым фоном."""
+        image = Image.new('RGBA', (10, 10), (0, 0, 0, 0))
+        flat = variants.prepare(image, 'JPEG')
+        self.assertEqual(flat.mode, 'RGB')
+        self.assertEqual(flat.getpixel((0, 0)), (255, 255, 255))
+
+    def test_srcset_rendered(self):
+        """Карточка и страница поста выводят srcset вариантов."""
+        post = ImageVariantTest.post
+        thumbnails.pregenerate(post.image.name)
+        variant = ImageVariant.objects.get(
+            source=post.image.name, format='JPEG', width=960
+        )
+        client = Client()
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        ):
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertContains(response, '<source type="image/jpeg"')
+                self.assertContains(response, f'{variant.file.url} 960w')
@@ -8,7 +8,8 @@ from django import forms
 from django.test import TestCase, Client, override_settings
 from django.core.cache import cache
 
-from ..models import Group, Post, User
+from ..caching import INDEX, generations, render_cards
+from ..models import Follow, Group, Post, User, post_images
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -88,6 +89,7 @@ class ContextCheck(TestCase):
             content=temp_gif,
             content_type='image/gif'
         )
+        cls.image_name = post_images.hashed_name('posts/temp.gif', uploaded)
         cls.user = User.objects.create_user(username='auth')
         cls.group = Group.objects.create(
             title='Test group',
@@ -117,7 +119,7 @@ class ContextCheck(TestCase):
             post.text: 'Всё чудесатее и чудесатее',
             post.group: ContextCheck.group,
             post.author.posts.count(): 1,
-            post.image: 'posts/temp.gif'
+            post.image: ContextCheck.image_name,
         }
 
     def test_index_context(self):
@@ -262,15 +264,77 @@ class PaginatorViewsTest(TestCase):
                     )
 
     def test_cache(self):
-        """Проверяем, что главная страница кэшируется."""
-        posts_to_show = self.client.get(
-            reverse('posts:index'), {'page': 2}
-        ).content.decode('utf-8').count('<article>')
+        """Главная страница кэшируется, пока посты не меняются сигналами."""
+        page = (reverse('posts:index'), {'page': 2})
+        posts_to_show = self.client.get(*page).content.decode(
+            'utf-8').count('<article>')
+        Post.objects.update(text='Изменено в обход сигналов')
+        self.assertNotContains(
+            self.client.get(*page), 'Изменено в обход сигналов'
+        )
         Post.objects.last().delete()
-        posts_shows = self.client.get(
-            reverse('posts:index'), {'page': 2}
-        ).content.decode('utf-8').count('<article>')
-        self.assertEqual(posts_shows, posts_to_show)
+        posts_shows = self.client.get(*page).content.decode(
+            'utf-8').count('<article>')
+        self.assertEqual(posts_shows, posts_to_show - 1)
+
+    def test_index_cache_hit_keeps_page_obj(self):
+        """page_obj главной одинакова при промахе и попадании в кэш."""
+        page = (reverse('posts:index'), {'page': 2})
+        pages = []
+        for _ in range(2):
+            response = self.client.get(*page)
+            page_obj = response.context['page_obj']
+            pages.append((
+                response.content,
+                page_obj.number,
+                page_obj.paginator.num_pages,
+                page_obj.has_previous(),
+                [post.text for post in page_obj],
+            ))
+        self.assertEqual(pages[0], pages[1])
+        self.assertEqual(pages[1][1:4], (2, 2, True))
+        self.assertEqual(len(pages[1][4]), 3)
+
+    @override_settings(POSTS_PAGINATION='cursor')
+    def test_index_cache_hit_keeps_cursor_page(self):
+        """Курсоры главной восстанавливаются из кэша без запроса постов."""
+        first = self.client.get(reverse('posts:index')).context['page_obj']
+        with self.assertNumQueries(0):
+            cached = self.client.get(
+                reverse('posts:index')
+            ).context['page_obj']
+            cursors = (cached.next_cursor, cached.previous_cursor)
+        self.assertEqual(cursors, (first.next_cursor, None))
+        self.assertEqual(list(cached), list(first))
+
+    def test_writes_refresh_feeds(self):
+        """Новый пост сразу виден на закэшированных страницах лент."""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=PaginatorViewsTest.user)
+        client = Client()
+        client.force_login(reader)
+        pages = (
+            reverse('posts:index'),
+            reverse(
+                'posts:group_list',
+                kwargs={'slug': PaginatorViewsTest.group.slug}
+            ),
+            reverse(
+                'posts:profile',
+                kwargs={'username': PaginatorViewsTest.user}
+            ),
+            reverse('posts:follow_index'),
+        )
+        for page in pages:
+            client.get(page)
+        Post.objects.create(
+            author=PaginatorViewsTest.user,
+            group=PaginatorViewsTest.group,
+            text='Свежий пост',
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                self.assertContains(client.get(page), 'Свежий пост')
 
     def test_unchached(self):
         """Проверяем, что после сброса кэша страница работает правильно."""
@@ -284,6 +348,303 @@ class PaginatorViewsTest(TestCase):
         self.assertEqual(posts_to_show - 1, posts_shows)
 
 
+class RenameRefreshTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='pippi', first_name='Пеппи'
+        )
+        cls.reader = User.objects.create_user(username='tommy')
+        cls.group = Group.objects.create(
+            title='Вилла «Курица»',
+            slug='villa',
+            description='Дом Пеппи',
+        )
+        Post.objects.create(
+            author=cls.author, group=cls.group, text='Лошадь на веранде'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(RenameRefreshTest.reader)
+        cache.clear()
+
+    def pages(self) -> list:
+        return [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'villa'}),
+            reverse('posts:profile', kwargs={'username': 'pippi'}),
+            reverse('posts:follow_index'),
+            reverse(
+                'posts:post_detail',
+                kwargs={'post_id': RenameRefreshTest.author.posts.get().pk}
+            ),
+        ]
+
+    def test_group_edit_refreshes_pages(self):
+        """Новые название и slug группы видны на закэшированных страницах."""
+        group_page = reverse('posts:group_list', kwargs={'slug': 'villa'})
+        for page in self.pages():
+            self.client.get(page)
+        group = RenameRefreshTest.group
+        group.title = 'Вилла «Курица», Швеция'
+        group.save()
+        self.assertContains(self.client.get(group_page), 'Швеция')
+        group.slug = 'kurica'
+        group.save()
+        new_link = reverse('posts:group_list', kwargs={'slug': 'kurica'})
+        for page in self.pages():
+            if page == group_page:
+                continue
+            with self.subTest(page=page):
+                self.assertContains(self.client.get(page), new_link)
+
+    def test_user_rename_refreshes_pages(self):
+        """Новое имя автора видно на всех страницах с его постами."""
+        for page in self.pages():
+            self.client.get(page)
+        author = RenameRefreshTest.author
+        author.first_name = 'Пеппилотта'
+        author.save()
+        for page in self.pages():
+            with self.subTest(page=page):
+                self.assertContains(self.client.get(page), 'Пеппилотта')
+
+    def test_login_keeps_generations(self):
+        """Вход обновляет last_login, но не сбрасывает кэш лент."""
+        [before] = generations([INDEX])
+        RenameRefreshTest.author.save(update_fields=['last_login'])
+        self.assertEqual(generations([INDEX]), [before])
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='Karlson', first_name='Карлсон'
+        )
+        cls.group = Group.objects.create(
+            title='Крыша',
+            slug='roof',
+            description='Тот, кто живёт на крыше',
+        )
+        Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='Спокойствие, только спокойствие',
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def test_cards_are_reused_between_pages(self):
+        """Карточки, нарисованные для главной, не рисуются для группы."""
+        self.client.get(reverse('posts:index'))
+        with self.assertTemplateNotUsed('posts/includes/article.html'):
+            response = self.client.get(
+                reverse(
+                    'posts:group_list',
+                    kwargs={'slug': PostCardCacheTest.group.slug}
+                )
+            )
+        self.assertContains(response, 'Спокойствие, только спокойствие')
+
+    def test_card_version_follows_author_name(self):
+        """Смена имени автора даёт новую версию карточки."""
+        [card] = render_cards(Post.objects.for_feed())
+        self.assertIn('Карлсон', card)
+        User.objects.filter(pk=PostCardCacheTest.user.pk).update(
+            first_name='Малыш'
+        )
+        [card] = render_cards(Post.objects.for_feed())
+        self.assertIn('Малыш', card)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Фрекен Бок')
+        cls.group = Group.objects.create(
+            title='Плюшки',
+            slug='buns',
+            description='Рецепты плюшек',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Сейчас будут плюшки'
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def urls(self) -> dict:
+        """Адреса и число запросов к базе на ответ 304."""
+        post = ConditionalGetTest.post
+        return {
+            reverse('posts:group_list', kwargs={'slug': 'buns'}): 0,
+            reverse('posts:profile', kwargs={'username': 'Фрекен Бок'}): 0,
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}): 1,
+        }
+
+    def test_not_modified(self):
+        """Повторный запрос получает 304 без чтения постов и комментариев."""
+        for url, queries in self.urls().items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                with self.assertNumQueries(queries):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(response.status_code, 304)
+                self.assertTrue(response.has_header('ETag'))
+
+    def test_etag_only(self):
+        """Last-Modified не отдаётся, и If-Modified-Since не даёт 304."""
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertFalse(response.has_header('Last-Modified'))
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT'
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_group_edit_changes_post_etag(self):
+        """Страница поста показывает название группы и зависит от неё."""
+        url = reverse(
+            'posts:post_detail', kwargs={'post_id': ConditionalGetTest.post.pk}
+        )
+        etag = self.client.get(url)['ETag']
+        ConditionalGetTest.group.title = 'Плюшки с корицей'
+        ConditionalGetTest.group.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Плюшки с корицей')
+
+    def test_changes_invalidate(self):
+        """Новый пост или комментарий меняет ETag страниц, где они видны."""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls()}
+        Post.objects.create(
+            author=ConditionalGetTest.user,
+            group=ConditionalGetTest.group,
+            text='Плюшки готовы',
+        )
+        ConditionalGetTest.post.comments.create(
+            author=ConditionalGetTest.user, text='Пахнет плюшками'
+        )
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_user_specific(self):
+        """ETag зависит от пользователя: после входа страница другая."""
+        url = reverse('posts:profile', kwargs={'username': 'Фрекен Бок'})
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(ConditionalGetTest.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(POSTS_PAGINATION='cursor')
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test',
+            description='Тествое описание',
+        )
+        Post.objects.bulk_create(
+            Post(
+                author=cls.user,
+                text=f'Курсор {number}',
+                group=cls.group
+            ) for number in range(1, 24)
+        )
+        # одинаковое время публикации проверяет сортировку по id
+        Post.objects.update(pub_date=Post.objects.first().pub_date)
+        cls.pages = (
+            reverse('posts:index'),
+            reverse(
+                'posts:group_list',
+                kwargs={'slug': cls.group.slug}
+            ),
+            reverse(
+                'posts:profile',
+                kwargs={'username': cls.user.username}
+            ),
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def walk(self, page, direction, params=None):
+        pages = []
+        while True:
+            cache.clear()
+            page_obj = self.client.get(page, params).context['page_obj']
+            pages.append(page_obj)
+            cursor = getattr(page_obj, f'{direction}_cursor')
+            if cursor is None:
+                return pages
+            params = {'after' if direction == 'next' else 'before': cursor}
+
+    def test_cursor_walks_all_posts(self):
+        """Курсоры проходят всю ленту без пропусков и повторов."""
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )
+        )
+        for page in CursorPaginatorViewsTest.pages:
+            with self.subTest(page=page):
+                forward = self.walk(page, 'next')
+                self.assertEqual(
+                    [len(page_obj) for page_obj in forward],
+                    [10, 10, 3]
+                )
+                self.assertEqual(
+                    [post.id for page_obj in forward for post in page_obj],
+                    expected
+                )
+
+    def test_cursor_walks_back(self):
+        """Переход назад возвращает те же страницы."""
+        for page in CursorPaginatorViewsTest.pages:
+            with self.subTest(page=page):
+                forward = self.walk(page, 'next')
+                backward = self.walk(
+                    page,
+                    'previous',
+                    {'before': forward[-1].previous_cursor}
+                )
+                self.assertEqual(
+                    [list(page_obj) for page_obj in backward[::-1]],
+                    [list(page_obj) for page_obj in forward[:-1]],
+                )
+                self.assertFalse(backward[-1].has_previous())
+
+    def test_broken_cursor(self):
+        """Испорченный токен открывает первую страницу."""
+        for token in ('', 'мусор', 'Zm9v', 'MjAyMi0wMXxhYmM'):
+            with self.subTest(token=token):
+                response = self.client.get(
+                    CursorPaginatorViewsTest.pages[0], {'after': token}
+                )
+                self.assertEqual(len(response.context['page_obj']), 10)
+                self.assertFalse(response.context['page_obj'].has_previous())
+
+
 class NewPostCreationCheck(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -0,0 +1,284 @@
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Exists, OuterRef
+from django.dispatch import Signal
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE, KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import variants
+from .models import ImageVariant, Post, ThumbnailJob, post_images
+
+logger = logging.getLogger(__name__)
+QUEUED_KEY = 'thumbnail:queued:{}'
+
+# Отправляется после создания миниатюр картинки: страницы с ней
+# пора пересобрать.
+thumbnails_ready = Signal(providing_args=['name'])
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class BatchedKVStore(KVStore):
+    """kvstore sorl с кэшем и базой, умеющий искать файлы пачкой."""
+
+    def get_many(self, image_files) -> dict:
+        """Файлы из kvstore по ключу; ненайденные — None.
+
+        Один get_many к кэшу и один запрос к базе на промахи кэша;
+        как и в _get_raw, отсутствие записи тоже кэшируется.
+        """
+        keys = {add_prefix(image_file.key): image_file.key
+                for image_file in image_files}
+        values = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            stored = dict(KVStoreModel.objects.filter(
+                key__in=missing
+            ).values_list('key', 'value'))
+            fetched = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(
+                fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+            values.update(fetched)
+        return {
+            keys[key]: (
+                None if value == EMPTY_VALUE or not value
+                else deserialize_image_file(value)
+            )
+            for key, value in values.items()
+        }
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl, который не создаёт миниатюры во время запроса.
+
+    Готовая миниатюра берётся из kvstore, вместо отсутствующей
+    отдаётся оригинал, а создание всех размеров ставится в очередь.
+    Для картинок, прошедших через prefetch(), kvstore не читается.
+    """
+
+    def thumbnail_options(self, source, options) -> dict:
+        """Опции, дополненные так же, как в ThumbnailBackend.get_thumbnail."""
+        options = dict(options)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return options
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """Файл миниатюры, который sorl создал бы для этих параметров."""
+        source = ImageFile(file_)
+        name = self._get_thumbnail_filename(
+            source, geometry_string, self.thumbnail_options(source, options)
+        )
+        return ImageFile(name, default.storage)
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        thumbnail = self.thumbnail_file(file_, geometry_string, **options)
+        prefetched = getattr(file_, 'prefetched_thumbnails', {})
+        if thumbnail.key in prefetched:
+            return prefetched[thumbnail.key] or ImageFile(file_)
+        thumbnail = default.kvstore.get(thumbnail)
+        if thumbnail:
+            return thumbnail
+        enqueue(file_.name if hasattr(file_, 'name') else file_)
+        return ImageFile(file_)
+
+    def generate(self, file_, geometry_string, **options):
+        return super().get_thumbnail(file_, geometry_string, **options)
+
+
+backend = DeferredThumbnailBackend()
+
+
+def is_ready(file_, size) -> bool:
+    """Есть ли миниатюра размера size из POST_THUMBNAILS."""
+    geometry, options = settings.POST_THUMBNAILS[size]
+    thumbnail = backend.thumbnail_file(file_, geometry, **options)
+    prefetched = getattr(file_, 'prefetched_thumbnails', {})
+    if thumbnail.key in prefetched:
+        return prefetched[thumbnail.key] is not None
+    return default.kvstore.get(thumbnail) is not None
+
+
+def prefetch(posts) -> None:
+    """Ищет миниатюры всех картинок постов одним обращением к kvstore.
+
+    Результат запоминается на post.image, и {% thumbnail %} с is_ready()
+    берут его оттуда; варианты для srcset читаются тем же заходом
+    в post.image.variants. Картинки без миниатюр или вариантов ставятся
+    в очередь.
+    """
+    wanted = {}
+    for post in posts:
+        if post.image:
+            wanted[post.image] = [
+                backend.thumbnail_file(post.image, geometry, **options)
+                for geometry, options in settings.POST_THUMBNAILS.values()
+            ]
+    if not wanted:
+        return
+    found = default.kvstore.get_many(
+        thumbnail for thumbnails in wanted.values() for thumbnail in thumbnails
+    )
+    by_source = {}
+    for variant in ImageVariant.objects.filter(
+        source__in={image.name for image in wanted}
+    ):
+        by_source.setdefault(variant.source, []).append(variant)
+    for image, thumbnails in wanted.items():
+        image.prefetched_thumbnails = {
+            thumbnail.key: found[thumbnail.key] for thumbnail in thumbnails
+        }
+        image.variants = by_source.get(image.name, [])
+        if None in image.prefetched_thumbnails.values() or not image.variants:
+            enqueue(image.name)
+
+
+def pregenerate(name) -> None:
+    """Создаёт миниатюры из POST_THUMBNAILS и варианты картинки name.
+
+    Задача снимается с очереди и при ошибке: она записывается в лог,
+    а картинка снова встанет в очередь, когда её покажет страница.
+    """
+    try:
+        source = ImageFile(name, post_images)
+        for geometry, options in settings.POST_THUMBNAILS.values():
+            backend.generate(source, geometry, **options)
+        variants.generate(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', name)
+    else:
+        thumbnails_ready.send(sender=DeferredThumbnailBackend, name=name)
+    finally:
+        ThumbnailJob.objects.filter(name=name).delete()
+        cache.delete(QUEUED_KEY.format(name))
+
+
+def _work(name) -> None:
+    try:
+        pregenerate(name)
+    finally:
+        # соединения потока пула иначе остались бы открытыми
+        connections.close_all()
+
+
+def executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def enqueue(name) -> None:
+    """Ставит создание миниатюр картинки в очередь ThumbnailJob.
+
+    Сама картинка в запросе не читается. Если включён пул потоков,
+    задача отдаётся ему после коммита; иначе её выполнит команда
+    process_thumbnails. Повторные вызовы, пока картинка в очереди,
+    ничего не делают.
+    """
+    if not cache.add(QUEUED_KEY.format(name), True,
+                     settings.THUMBNAIL_QUEUE_TIMEOUT):
+        return
+    ThumbnailJob.objects.bulk_create(
+        [ThumbnailJob(name=name)], ignore_conflicts=True
+    )
+    if settings.THUMBNAIL_WORKERS:
+        transaction.on_commit(lambda: executor().submit(_work, name))
+
+
+def drain(limit=None) -> int:
+    """Выполняет задачи очереди по порядку; возвращает их число."""
+    names = list(
+        ThumbnailJob.objects.values_list('name', flat=True)[:limit]
+    )
+    for name in names:
+        pregenerate(name)
+    return len(names)
+
+
+def _walk(storage, path):
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield posixpath.join(path, name)
+    for directory in directories:
+        yield from _walk(storage, posixpath.join(path, directory))
+
+
+def still_unused(name, deadline) -> bool:
+    """Проверка прямо перед удалением: картинку могли загрузить снова."""
+    return (
+        post_images.exists(name)
+        and post_images.get_modified_time(name) < deadline
+        and not Post.objects.filter(image=name).exists()
+    )
+
+
+def sweep(min_age, dry_run=False) -> list:
+    """Удаляет картинки, на которые не ссылается ни один пост.
+
+    Вместе с картинкой удаляются её миниатюры и варианты. Файлы моложе
+    min_age секунд не трогаются: пост с ними может ещё сохраняться, а
+    повторная загрузка той же картинки обновляет время файла. Перед
+    удалением каждого файла ссылки и время проверяются ещё раз.
+    Варианты появляются только у сохранённых постов, поэтому варианты
+    картинок без постов удаляются независимо от возраста. Возвращает
+    имена удалённых файлов.
+    """
+    root = Post.image.field.upload_to.rstrip('/')
+    deadline = timezone.now() - timedelta(seconds=min_age)
+    unused = []
+    if post_images.exists(root):
+        used = set(
+            Post.objects.exclude(image='').values_list('image', flat=True)
+        )
+        unused = [
+            name for name in _walk(post_images, root)
+            if name not in used
+            and post_images.get_modified_time(name) < deadline
+        ]
+    orphans = list(ImageVariant.objects.annotate(
+        used=Exists(Post.objects.filter(image=OuterRef('source')))
+    ).filter(used=False))
+    if dry_run:
+        return unused + [variant.file.name for variant in orphans]
+    removed = []
+    for name in unused:
+        if still_unused(name, deadline):
+            backend.delete(ImageFile(name, post_images))
+            removed.append(name)
+    ThumbnailJob.objects.filter(name__in=removed).delete()
+    for variant in orphans:
+        removed.append(variant.file.name)
+        variant.file.delete(save=False)
+    ImageVariant.objects.filter(
+        pk__in=[variant.pk for variant in orphans]
+    ).delete()
+    return removed
@@ -0,0 +1,117 @@
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .models import ImageVariant, post_images
+
+VARIANT_PATH = 'variants/{digest}/{width}.{extension}'
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+}
+
+
+def encodable(image_format) -> bool:
+    """Умеет ли установленный Pillow сохранять в этот формат."""
+    Image.init()
+    return image_format in Image.SAVE
+
+
+def formats() -> list:
+    """Форматы из POST_IMAGE_FORMATS, которые можно создать здесь."""
+    return [
+        image_format for image_format in settings.POST_IMAGE_FORMATS
+        if encodable(image_format)
+    ]
+
+
+def sizes(width, height) -> list:
+    """Размеры вариантов: рамки POST_IMAGE_WIDTHS без увеличения.
+
+    Рамка варианта пропорциональна рамке миниатюры карточки, картинка
+    вписывается в неё с сохранением пропорций, как это делает sorl.
+    """
+    box_width, box_height = settings.POST_IMAGE_BOX
+    found = {}
+    for box in settings.POST_IMAGE_WIDTHS:
+        scale = min(box / width, box * box_height / box_width / height, 1)
+        size = (max(round(width * scale), 1), max(round(height * scale), 1))
+        found[size[0]] = size
+    return sorted(found.values())
+
+
+def prepare(image, image_format):
+    """Картинка в режиме, который поддерживает формат."""
+    has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+    if image_format == 'JPEG' and has_alpha:
+        image = image.convert('RGBA')
+        flat = Image.new('RGB', image.size, 'white')
+        flat.paste(image, mask=image.getchannel('A'))
+        return flat
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def generate(name) -> list:
+    """Создаёт недостающие варианты картинки name и записывает их в базу.
+
+    Уже записанные варианты не пересоздаются.
+    """
+    wanted = formats()
+    existing = set(
+        ImageVariant.objects.filter(source=name).values_list('format', 'width')
+    )
+    with post_images.open(name) as file:
+        image = Image.open(file)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    digest = hashlib.md5(name.encode()).hexdigest()
+    created = []
+    for image_format in wanted:
+        prepared = prepare(image, image_format)
+        extension = 'jpg' if image_format == 'JPEG' else image_format.lower()
+        for width, height in sizes(*image.size):
+            if (image_format, width) in existing:
+                continue
+            buffer = BytesIO()
+            prepared.resize((width, height), Image.LANCZOS).save(
+                buffer, image_format,
+                quality=settings.POST_IMAGE_QUALITY, optimize=True,
+            )
+            path = default_storage.save(
+                VARIANT_PATH.format(
+                    digest=digest, width=width, extension=extension
+                ),
+                ContentFile(buffer.getvalue()),
+            )
+            created.append(ImageVariant(
+                source=name, width=width, height=height,
+                format=image_format, file=path, size=buffer.tell(),
+            ))
+    ImageVariant.objects.bulk_create(created, ignore_conflicts=True)
+    return created
+
+
+def srcsets(variants) -> list:
+    """Пары (MIME-тип, srcset) в порядке POST_IMAGE_FORMATS."""
+    by_format = {}
+    for variant in variants:
+        by_format.setdefault(variant.format, []).append(variant)
+    return [
+        (
+            MIME_TYPES[image_format],
+            ', '.join(
+                f'{variant.file.url} {variant.width}w'
+                for variant in sorted(
+                    by_format[image_format], key=lambda item: item.width
+                )
+            ),
+        )
+        for image_format in settings.POST_IMAGE_FORMATS
+        if image_format in by_format
+    ]
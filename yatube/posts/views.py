@@ -1,35 +1,60 @@
 from http.client import HTTPResponse
 
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
-from django.core.paginator import Paginator
+from django.core.paginator import Page, Paginator
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_safe
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
-
-from .models import Post, Group, Follow, User
-from .forms import PostForm, CommentForm
-
-
-def paginator(request, posts) -> Paginator:
-    paginator = Paginator(posts, 10)
+from django.db import IntegrityError, transaction
+
+from core.uploads import limit_uploads
+from .caching import (
+    FOLLOW, GROUP, INDEX, POST, PROFILE, cache_feed, conditional,
+    not_modified, shared_fragment, validators, with_validators
+)
+from .models import AuthorStats, Post, Group, Follow, User
+from .export import FORMATS, stream
+from .forms import CommentForm, ExportForm, PostForm
+from .feeds import follow_feed
+from .pagination import KEYS, CursorPaginator
+from .search import find_posts
+from .thumbnails import prefetch as prefetch_thumbnails
+
+POST_LIST = 'posts/includes/post_list.html'
+
+
+def paginator(request, posts, keys=KEYS) -> Page:
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if settings.POSTS_PAGINATION == 'cursor' or after or before:
+        return CursorPaginator(
+            posts, settings.POSTS_PER_PAGE, keys
+        ).get_page(after, before)
+    paginator = Paginator(posts, settings.POSTS_PER_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
 
 
-@cache_page(20, key_prefix='index_page')
 def index(request) -> HTTPResponse:
     template = 'posts/index.html'
-    posts = Post.objects.all()
-    context: dict = {
-        'page_obj': paginator(request, posts)
-    }
+    post_list, context = shared_fragment(
+        request, POST_LIST, [INDEX], Post.objects.for_feed(),
+        lambda posts: paginator(request, posts)
+    )
+    context['post_list'] = post_list
     return render(request, template, context)
 
 
+@conditional(GROUP)
+@cache_feed(GROUP)
 def group_posts(request, slug) -> HTTPResponse:
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = group.posts.for_feed()
     context: dict = {
         'group': group,
         'page_obj': paginator(request, posts),
@@ -37,17 +62,20 @@ def group_posts(request, slug) -> HTTPResponse:
     return render(request, template, context)
 
 
+@conditional(PROFILE)
+@cache_feed(PROFILE)
 def profile(request, username) -> HTTPResponse:
     template = 'posts/profile.html'
     author = get_object_or_404(User, username=username)
     is_following = None
     if request.user.is_authenticated:
         is_following = request.user.follower.filter(author=author).exists()
-    posts_count = author.posts.count()
+    stats = AuthorStats.objects.for_user(author)
     context = {
         'author': author,
-        'page_obj': paginator(request, author.posts.all()),
-        'posts_count': posts_count,
+        'page_obj': paginator(request, author.posts.for_feed()),
+        'posts_count': stats.posts_count,
+        'stats': stats,
         'following': is_following,
     }
     return render(request, template, context)
@@ -55,9 +83,20 @@ def profile(request, username) -> HTTPResponse:
 
 def post_detail(request, post_id) -> HTTPResponse:
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, id=post_id)
-    posts_count = Post.objects.filter(author_id=post.author_id).count()
-    comments = post.comments.all()
+    post = get_object_or_404(Post.objects.for_feed(), id=post_id)
+    scopes = [
+        POST.format(post_id=post.pk),
+        PROFILE.format(username=post.author.username),
+    ]
+    if post.group_id:
+        scopes.append(GROUP.format(slug=post.group.slug))
+    etag = validators(request, scopes)
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    prefetch_thumbnails([post])
+    posts_count = AuthorStats.objects.for_user(post.author).posts_count
+    comments = post.comments.select_related('author')
     form = CommentForm(
         request.POST or None,
     )
@@ -67,10 +106,12 @@ def post_detail(request, post_id) -> HTTPResponse:
         'form': form,
         'comments': comments,
     }
-    return render(request, template, context)
+    return with_validators(render(request, template, context), etag)
 
 
+@limit_uploads
 @login_required
+@transaction.atomic
 def post_create(request) -> HTTPResponse:
     user = request.user
     template = 'posts/create_post.html'
@@ -90,10 +131,11 @@ def post_create(request) -> HTTPResponse:
     return render(request, template, context)
 
 
+@limit_uploads
 def post_edit(request, post_id) -> HTTPResponse:
     template = 'posts/create_post.html'
     post = get_object_or_404(Post, id=post_id)
-    if post.author != request.user:
+    if post.author_id != request.user.id:
         return redirect('posts:post_detail', post_id)
     form = PostForm(
         request.POST or None,
@@ -113,6 +155,7 @@ def post_edit(request, post_id) -> HTTPResponse:
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id) -> HTTPResponse:
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -124,31 +167,72 @@ def add_comment(request, post_id) -> HTTPResponse:
     return redirect('posts:post_detail', post_id)
 
 
+def search(request) -> HTTPResponse:
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    posts = find_posts(query, Post.objects.for_feed())
+    page_obj = Paginator(posts, settings.POSTS_PER_PAGE).get_page(
+        request.GET.get('page')
+    )
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
 @login_required
+@cache_feed(FOLLOW)
 def follow_index(request) -> HTTPResponse:
     template = 'posts/follow.html'
-    current_user = request.user
-    posts = Post.objects.filter(
-        author__following__user=current_user
-    )
+    posts, keys = follow_feed(request.user)
+    page_obj = paginator(request, posts, keys)
+    if settings.FOLLOW_FEED_ENGINE == 'timeline':
+        page_obj.object_list = [entry.post for entry in page_obj]
     context = {
-        'page_obj': paginator(request, posts),
+        'page_obj': page_obj,
     }
     return render(request, template, context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username) -> HTTPResponse:
     author = get_object_or_404(User, username=username)
-    if Follow.objects.filter(user=request.user, author=author).exists():
-        return redirect('posts:profile', username)
     if request.user != author:
-        Follow.objects.create(user=request.user, author=author)
+        try:
+            with transaction.atomic():
+                Follow.objects.create(user=request.user, author=author)
+        except IntegrityError:
+            pass
     return redirect('posts:profile', username)
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username) -> HTTPResponse:
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username)
+
+
+@require_safe
+@staff_member_required
+def export(request) -> HTTPResponse:
+    """Потоковая выгрузка постов или комментариев для персонала."""
+    form = ExportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(
+            form.errors.as_text(), content_type='text/plain; charset=utf-8'
+        )
+    options = form.cleaned_data
+    response = StreamingHttpResponse(
+        (chunk.encode() for chunk in stream(**options)),
+        content_type=FORMATS[options['format']],
+    )
+    filename = (
+        f'{options["kind"]}-{timezone.now():%Y%m%d-%H%M%S}'
+        f'.{options["format"]}'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -135,6 +135,11 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'), )
+STATIC_ROOT = os.path.join(BASE_DIR, 'static_root')
+# Вне отладки collectstatic добавляет к именам хеш содержимого и кладёт
+# рядом сжатые копии; в отладке runserver отдаёт файлы как есть.
+if not DEBUG:
+    STATICFILES_STORAGE = 'core.static.CompressedManifestStaticFilesStorage'
 
 
 LOGIN_URL = 'users:login'
@@ -150,11 +155,79 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Картинки постов (core.uploads.limit_uploads на post_create и post_edit)
+# пишутся на диск кусками сразу, не собираясь в памяти, и не больше
+# FILE_UPLOAD_MAX_SIZE байт. Они ограничены ещё и числом пикселей,
+# которое читается из заголовка файла.
+FILE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 25_000_000
+
+# Команды bench_* подменяют кэш по умолчанию кэшем 'bench' и очищают
+# его между замерами, поэтому он не должен делить хранилище с 'default'.
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'bench': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bench',
+    },
 }
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+# Размер страницы лент и режим пагинации: 'offset' (?page=N)
+# или 'cursor' (?after=/?before= по паре pub_date, id).
+POSTS_PER_PAGE = 10
+POSTS_PAGINATION = 'offset'
+
+# Лента подписок: 'timeline' читает материализованные ленты FeedEntry,
+# 'merge' сливает кэшированные списки последних постов авторов,
+# 'join' строит ленту запросом через Follow. FOLLOW_FEED_LENGTH —
+# сколько последних постов хранится в ленте каждого читателя; новые
+# посты ленты не обрезают, это делает периодическая команда trim_feeds.
+# FOLLOW_FEED_RECENT — длина кэшированного списка постов автора.
+FOLLOW_FEED_ENGINE = 'timeline'
+FOLLOW_FEED_LENGTH = 1000
+FOLLOW_FEED_RECENT = 100
+
+# Страницы лент кэшируются надолго: ключ включает поколения их областей
+# (posts/caching.py), и записи сдвигают поколения сигналами.
+FEED_CACHE_TIMEOUT = 60 * 60
+
+# Защита от одновременного пересчёта (core/guarded_cache.py): истёкшее
+# значение ещё CACHE_GRACE секунд отдаётся, пока один запрос под
+# блокировкой на CACHE_LOCK_TIMEOUT секунд считает новое.
+CACHE_GRACE = 30
+CACHE_LOCK_TIMEOUT = 10
+
+# Карточки постов кэшируются по отпечатку их содержимого и не требуют
+# сброса, поэтому могут жить долго.
+POST_CARD_TIMEOUT = 60 * 60 * 24
+
+# Миниатюры картинок постов создаются заранее и никогда в запросе:
+# запрос только записывает картинку в очередь ThumbnailJob. Очередь
+# разбирает команда process_thumbnails (--loop держит её запущенной)
+# и, если задана переменная окружения THUMBNAIL_WORKERS, пул из
+# стольких потоков сразу после коммита. Пул не дожидается конца задач,
+# поэтому в тестах и разработке выключен. Размеры должны совпадать
+# с тегами {% thumbnail %} в шаблонах; пока миниатюры нет, шаблон
+# получает оригинал. THUMBNAIL_QUEUE_TIMEOUT — сколько секунд картинка
+# считается поставленной в очередь.
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeferredThumbnailBackend'
+THUMBNAIL_KVSTORE = 'posts.thumbnails.BatchedKVStore'
+POST_THUMBNAILS = {
+    'card': ('960x339', {'upscale': True}),
+}
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 0))
+THUMBNAIL_QUEUE_TIMEOUT = 60 * 10
+
+# Варианты картинок постов для srcset: рамки шириной POST_IMAGE_WIDTHS
+# с пропорциями POST_IMAGE_BOX (рамка миниатюры карточки) в форматах
+# POST_IMAGE_FORMATS по убыванию предпочтения. Форматы, которые
+# установленный Pillow не умеет сохранять, пропускаются.
+POST_IMAGE_BOX = (960, 339)
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+POST_IMAGE_QUALITY = 80
@@ -10,10 +10,16 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/v1/', include('posts.api_urls', namespace='api')),
 ]
 if settings.DEBUG:
     import debug_toolbar
     urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),) 
+else:
+    from core import static
+    urlpatterns += (
+        path(settings.STATIC_URL.lstrip('/') + '<path:path>', static.serve),
+    )
 
 handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'